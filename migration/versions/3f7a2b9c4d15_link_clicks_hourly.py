@@ -0,0 +1,39 @@
+"""link_clicks_hourly: hourly click rollups from the click stream
+
+Revision ID: 3f7a2b9c4d15
+Revises: 9c0fb62d7ed0
+Create Date: 2026-10-18 16:21:07.402913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f7a2b9c4d15'
+down_revision: Union[str, None] = '9c0fb62d7ed0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if sa.inspect(op.get_bind()).has_table("link_clicks_hourly"):
+        # уже создана через create_all (пустая база с LINKS_PARTITIONING)
+        return
+    op.create_table(
+        "link_clicks_hourly",
+        sa.Column("link_id", sa.Integer(), nullable=False),
+        sa.Column("hour", sa.DateTime(), nullable=False),
+        sa.Column("clicks", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("link_id", "hour"),
+    )
+    op.create_index("ix_link_clicks_hourly_hour", "link_clicks_hourly", ["hour"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_link_clicks_hourly_hour", table_name="link_clicks_hourly")
+    op.drop_table("link_clicks_hourly")
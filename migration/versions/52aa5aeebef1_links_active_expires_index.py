@@ -0,0 +1,32 @@
+"""links (is_active, expires_at) index for the cleanup sweeper
+
+Revision ID: 52aa5aeebef1
+Revises: 5be5d32b5ecd
+Create Date: 2026-10-18 13:10:52.871204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '52aa5aeebef1'
+down_revision: Union[str, None] = '5be5d32b5ecd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("links"):
+        # на пустой базе таблицы вместе с индексом создаст приложение (create_all)
+        return
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_links_active_expires ON links (is_active, expires_at)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_links_active_expires")
@@ -0,0 +1,56 @@
+"""links url search indexes
+
+Revision ID: 571155defa3d
+Revises: e81ac60a168f
+Create Date: 2026-10-18 11:20:34.108316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '571155defa3d'
+down_revision: Union[str, None] = 'e81ac60a168f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 50000
+# то же, что src.url.models.extract_host: схема и user@ необязательны, берём хост до порта/пути
+HOST_PATTERN = r'^(?:[A-Za-z][A-Za-z0-9+.-]*://)?(?:[^@/?#]*@)?([^:/?#]+)'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("links"):
+        # на пустой базе таблицы вместе с индексами создаст приложение (create_all)
+        return
+    op.execute("ALTER TABLE links ADD COLUMN IF NOT EXISTS host VARCHAR")
+
+    max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM links")).scalar()
+    with op.get_context().autocommit_block():
+        # пачками по id, чтобы не держать блокировку на всю таблицу и не раздувать WAL одной транзакцией
+        for start in range(0, max_id + 1, BACKFILL_BATCH):
+            bind.execute(
+                sa.text(
+                    "UPDATE links SET host = lower(substring(original_url from :pattern)) "
+                    "WHERE id >= :start AND id < :end AND host IS NULL"
+                ),
+                {"pattern": HOST_PATTERN, "start": start, "end": start + BACKFILL_BATCH},
+            )
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_links_host ON links (host)")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_links_original_url_trgm "
+            "ON links USING gin (lower(original_url) gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_links_original_url_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_links_host")
+    op.execute("ALTER TABLE IF EXISTS links DROP COLUMN IF EXISTS host")
@@ -0,0 +1,36 @@
+"""links (owner_id, is_active, expires_at DESC) index for owner listings
+
+Revision ID: 5be5d32b5ecd
+Revises: cd1207a8496f
+Create Date: 2026-10-18 12:41:19.604127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5be5d32b5ecd'
+down_revision: Union[str, None] = 'cd1207a8496f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("links"):
+        # на пустой базе таблицы вместе с индексом создаст приложение (create_all)
+        return
+    with op.get_context().autocommit_block():
+        # id в конце - для однозначного порядка keyset-пагинации при одинаковом expires_at
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_links_owner_active_expires "
+            "ON links (owner_id, is_active, expires_at DESC, id DESC)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_links_owner_active_expires")
@@ -0,0 +1,36 @@
+"""click_flushes: ids of applied click buffer flushes
+
+Revision ID: 6d2e9f4b8a37
+Revises: 8e4d1c6a2f90
+Create Date: 2026-10-18 19:12:03.518027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d2e9f4b8a37'
+down_revision: Union[str, None] = '8e4d1c6a2f90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if sa.inspect(op.get_bind()).has_table("click_flushes"):
+        # уже создана через create_all (пустая база с LINKS_PARTITIONING)
+        return
+    op.create_table(
+        "click_flushes",
+        sa.Column("flush_id", sa.String(), nullable=False),
+        sa.Column("flushed_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("flush_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("click_flushes")
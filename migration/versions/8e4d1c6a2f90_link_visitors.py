@@ -0,0 +1,40 @@
+"""link_visitors: HyperLogLog snapshots of unique visitors per link
+
+Revision ID: 8e4d1c6a2f90
+Revises: 3f7a2b9c4d15
+Create Date: 2026-10-18 17:05:44.190372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4d1c6a2f90'
+down_revision: Union[str, None] = '3f7a2b9c4d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if sa.inspect(op.get_bind()).has_table("link_visitors"):
+        # уже создана через create_all (пустая база с LINKS_PARTITIONING)
+        return
+    op.create_table(
+        "link_visitors",
+        sa.Column("link_id", sa.Integer(), nullable=False),
+        sa.Column("hll", sa.LargeBinary(), nullable=False),
+        sa.Column("unique_visitors", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("link_id"),
+    )
+    op.create_index("ix_link_visitors_updated_at", "link_visitors", ["updated_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_link_visitors_updated_at", table_name="link_visitors")
+    op.drop_table("link_visitors")
@@ -0,0 +1,47 @@
+"""partition links by expires_at (optional, LINKS_PARTITIONING=day|week)
+
+Revision ID: 9c0fb62d7ed0
+Revises: 52aa5aeebef1
+Create Date: 2026-10-18 14:02:33.518260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.config import LINKS_PARTITIONING
+from src.database import Base
+from src.url.partitions import PERIOD_DAYS, partition_links, unpartition_links
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c0fb62d7ed0'
+down_revision: Union[str, None] = '52aa5aeebef1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def is_partitioned(bind) -> bool:
+    return bool(bind.execute(sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('links')")).scalar())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not LINKS_PARTITIONING:
+        return
+    if LINKS_PARTITIONING not in PERIOD_DAYS:
+        raise ValueError(f"LINKS_PARTITIONING должен быть одним из {sorted(PERIOD_DAYS)}, а не {LINKS_PARTITIONING!r}")
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("links"):
+        # на пустой базе приложение создало бы обычную links, создаём таблицы здесь и сразу секционируем
+        Base.metadata.create_all(bind)
+    if not is_partitioned(bind):
+        partition_links(bind, LINKS_PARTITIONING)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if is_partitioned(bind):
+        unpartition_links(bind)
@@ -0,0 +1,27 @@
+"""short code sequence
+
+Revision ID: a5fc825e0b5a
+Revises: d743dbb5aef8
+Create Date: 2026-10-18 10:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5fc825e0b5a'
+down_revision: Union[str, None] = 'd743dbb5aef8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE SEQUENCE IF NOT EXISTS short_code_seq")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP SEQUENCE IF EXISTS short_code_seq")
@@ -0,0 +1,32 @@
+"""links (created_at, id) index for keyset pagination
+
+Revision ID: cd1207a8496f
+Revises: 571155defa3d
+Create Date: 2026-10-18 12:05:41.220937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cd1207a8496f'
+down_revision: Union[str, None] = '571155defa3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("links"):
+        # на пустой базе таблицы вместе с индексом создаст приложение (create_all)
+        return
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_links_created_at_id ON links (created_at, id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_links_created_at_id")
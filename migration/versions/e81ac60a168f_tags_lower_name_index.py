@@ -0,0 +1,49 @@
+"""tags lower(name) unique index
+
+Revision ID: e81ac60a168f
+Revises: a5fc825e0b5a
+Create Date: 2026-10-18 10:41:07.552981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81ac60a168f'
+down_revision: Union[str, None] = 'a5fc825e0b5a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("tags"):
+        # на пустой базе таблицы вместе с индексом создаст приложение (create_all)
+        return
+    # теги, отличающиеся только регистром, сливаем в самый старый, иначе индекс не построить
+    op.execute("""
+        WITH keep AS (
+            SELECT id, min(id) OVER (PARTITION BY lower(name)) AS keep_id FROM tags
+        )
+        UPDATE links SET tag_id = keep.keep_id
+        FROM keep
+        WHERE links.tag_id = keep.id AND keep.id <> keep.keep_id
+    """)
+    op.execute("""
+        DELETE FROM tags
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, min(id) OVER (PARTITION BY lower(name)) AS keep_id FROM tags
+            ) dups
+            WHERE id <> keep_id
+        )
+    """)
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_tags_name_lower ON tags (lower(name))")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_tags_name_lower")
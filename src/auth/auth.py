@@ -1,24 +1,36 @@
 from fastapi import APIRouter, HTTPException, Depends, Response, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from src.config import TTL
-from src.database import get_db
+from src.database import get_db, AsyncSessionLocal
 from src.auth.models import get_user_by_email, create_user
 from src.auth.schemas import UserCreate, UserResponse
-from src.auth.utils import hash_password, verify_password, create_access_token, decode_access_token
+from src.auth.utils import create_access_token, decode_access_token, token_cache
+from src.auth.hashing import password_hasher
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
-def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+ANONYMOUS_EMAIL = "anonymous@example.com"
 
+async def ensure_anonymous_user(session_factory=AsyncSessionLocal):
+    """Заводит служебного анонимного пользователя. Вызывается один раз при старте, а не на каждый запрос."""
+    async with session_factory() as db:
+        if await get_user_by_email(db, ANONYMOUS_EMAIL):
+            return
+        try:
+            await create_user(db, ANONYMOUS_EMAIL, await password_hasher.hash("anonymous"))
+        except IntegrityError:
+            # его уже создал соседний воркер
+            await db.rollback()
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
+    # ни сессии, ни запросов к БД: аноним и валидный JWT разрешаются в памяти
     if not token:
         token = request.cookies.get("access_token")
     if not token:
-        anon = get_user_by_email(db, "anonymous@example.com")
-        if not anon:
-            anon = create_user(db, "anonymous@example.com", hash_password("anonymous"))
         return {"sub": None}
     payload = decode_access_token(token)
     if not payload or "sub" not in payload:
@@ -29,18 +41,18 @@ def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db:
     return payload
 
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = get_user_by_email(db, user.email)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    existing_user = await get_user_by_email(db, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")
-    hashed_password = hash_password(user.password)
-    new_user = create_user(db, user.email, hashed_password)
+    hashed_password = await password_hasher.hash(user.password)
+    new_user = await create_user(db, user.email, hashed_password)
     return new_user
 
 @router.post("/login", response_model=UserResponse)
-def login(user: UserCreate, response: Response, db: Session = Depends(get_db)):
-    db_user = get_user_by_email(db, user.email)
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def login(user: UserCreate, response: Response, db: AsyncSession = Depends(get_db)):
+    db_user = await get_user_by_email(db, user.email)
+    if not db_user or not await password_hasher.verify(user.password, db_user.hashed_password):
         raise HTTPException(status_code=400, detail="Неверные учетные данные")
     access_token = create_access_token(
         data={"sub": str(db_user.id)}, expires_delta=timedelta(minutes=TTL)
@@ -48,6 +60,14 @@ def login(user: UserCreate, response: Response, db: Session = Depends(get_db)):
     response.set_cookie(key="access_token", value=access_token, httponly=True)
     return db_user
 
+@router.get("/hash/stats")
+async def get_hash_stats():
+    return password_hasher.stats()
+
+@router.get("/token/stats")
+async def get_token_stats():
+    return token_cache.stats()
+
 @router.post("/logout")
 def logout(response: Response):
     response.delete_cookie(key="access_token")
@@ -0,0 +1,89 @@
+"""Хэширование паролей в отдельном пуле процессов.
+
+bcrypt держит GIL и забивает общий threadpool Starlette, из-за чего всплеск логинов тормозит
+остальные запросы. Здесь пул ограничен по числу процессов и по длине очереди: при переполнении
+сразу отвечаем 503, а не копим ожидающих.
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException, status
+
+from src.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+from src.auth.utils import hash_password, verify_password
+
+LATENCY_WINDOW = 1000 # последних замеров для перцентилей
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # процессы поднимаем при первом хэше, а не при импорте
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, повторите попытку позже",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+            elapsed = time.perf_counter() - started
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self._latencies.append(elapsed)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def _percentile(self, latencies: list, q: float) -> float:
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "p50_ms": round(self._percentile(latencies, 0.5) * 1000, 2),
+            "p99_ms": round(self._percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, select
 from src.database import Base
 from sqlalchemy.orm import relationship
 
@@ -10,12 +10,13 @@ class User(Base):
 
     links = relationship("Link", back_populates="owner", cascade="all, delete-orphan")
 
-def get_user_by_email(db, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
 
-def create_user(db, email: str, hashed_password: str):
+async def create_user(db, email: str, hashed_password: str):
     new_user = User(email=email, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
\ No newline at end of file
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
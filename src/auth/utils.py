@@ -1,9 +1,13 @@
 from passlib.context import CryptContext
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import hashlib
+import time
 import jwt
-from src.config import SECRET_KEY
+from src.config import SECRET_KEY, BCRYPT_ROUNDS, ALGORITHM, TOKEN_CACHE_SIZE
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -15,12 +19,67 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=15))
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm="HS256")
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class TokenCache:
+    """LRU sha256(алгоритм + токен) -> payload уже проверенных JWT. Запись живёт до exp токена."""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(token: str, algorithm: str = ALGORITHM) -> bytes:
+        return hashlib.sha256(f"{algorithm}:{token}".encode("utf-8")).digest()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[1])
+
+    def set(self, key: bytes, payload: dict):
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)):
+            # без exp токен бессрочный, такие не кэшируем
+            return
+        self._entries[key] = (exp, dict(payload))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+token_cache = TokenCache()
+
 def decode_access_token(token: str) -> dict:
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    key = TokenCache.key(token)
+    payload = token_cache.get(key)
+    if payload is not None:
         return payload
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.PyJWTError:
-        return {}
\ No newline at end of file
+        return {}
+    token_cache.set(key, payload)
+    return payload
\ No newline at end of file
@@ -0,0 +1,84 @@
+import time
+import uuid
+from typing import Optional
+from redis import asyncio as aioredis
+from redis.asyncio.client import Pipeline
+from src.metrics import observe_redis
+from src.config import (
+    REDIS_URL,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT,
+    REDIS_SOCKET_TIMEOUT,
+    REDIS_SOCKET_CONNECT_TIMEOUT,
+    REDIS_HEALTH_CHECK_INTERVAL,
+)
+
+
+class TimedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            observe_redis("PIPELINE", time.perf_counter() - started)
+
+
+class TimedRedis(aioredis.Redis):
+    """Клиент, который пишет время каждой команды в redis_command_duration_seconds."""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            observe_redis(str(args[0]).upper(), time.perf_counter() - started)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+redis_pool: Optional[aioredis.BlockingConnectionPool] = None
+redis_client: Optional[aioredis.Redis] = None
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+async def init_redis():
+    global redis_pool, redis_client
+    redis_pool = aioredis.BlockingConnectionPool.from_url(
+        REDIS_URL,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    )
+    redis_client = TimedRedis(connection_pool=redis_pool)
+
+async def close_redis():
+    global redis_pool, redis_client
+    if redis_client is not None:
+        await redis_client.aclose()
+    if redis_pool is not None:
+        await redis_pool.disconnect()
+    redis_pool = None
+    redis_client = None
+
+async def get_redis() -> aioredis.Redis:
+    if redis_client is None:
+        raise RuntimeError("Redis не инициализирован, init_redis() вызывается при старте приложения")
+    return redis_client
+
+async def acquire_lock(redis, key: str, ttl_ms: int) -> Optional[str]:
+    token = uuid.uuid4().hex
+    if await redis.set(key, token, nx=True, px=ttl_ms):
+        return token
+    return None
+
+async def release_lock(redis, key: str, token: str):
+    # снимаем только свою блокировку, чужую (после истечения нашей аренды) не трогаем
+    await redis.eval(RELEASE_LOCK_SCRIPT, 1, key, token)
@@ -1,41 +1,190 @@
+import argparse
 import asyncio
+import time
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from src.database import get_db
+from typing import List, Optional, Tuple
+from sqlalchemy import select, update, delete, func
+from src.database import AsyncSessionLocal, close_db
+from src.cache import get_redis, init_redis, close_redis
 from src.url.models import Link
-from src.config import TTL_LINK, CLEANUP_INTERVAL
+from src.auth import models as auth_models  # noqa: F401 - связи Link ссылаются на User, при запуске отдельным процессом
+from src.url.redirect_cache import cache_markers, evict_links, EXPIRED
+from src.url.partitions import links_partitioned, ensure_partitions, purge_partitions, links_default
+from src.url.click_stream import purge_rollups
+from src.url.visitors import purge_visitors
+from src.metrics import CLEANUP_DURATION, CLEANUP_RUNS, CLEANUP_ROWS
+from src.config import (
+    TTL_LINK,
+    CLEANUP_INTERVAL,
+    CLEANUP_BATCH_SIZE,
+    CLEANUP_TIME_BUDGET,
+    CLEANUP_BACKLOG_DELAY,
+    EXPIRED_CACHE_TTL,
+    CLEANER_METRICS_PORT,
+    CLICK_ROLLUP_RETENTION_DAYS,
+)
+from prometheus_client import start_http_server
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def cleanup_expired_links(loop_once: bool = False):
+# ключ advisory lock в Postgres, общий для всех процессов чистильщика
+CLEANUP_LOCK_ID = 804118
+
+
+def locked_batch(*conditions, batch_size: int, links=Link.__table__):
+    # строки, которые прямо сейчас держит другая транзакция (редирект, второй чистильщик), пропускаем
+    return (
+        select(links.c.id)
+        .where(*conditions)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+
+
+async def deactivate_batch(db, now: datetime, batch_size: int) -> List[str]:
+    batch = locked_batch(Link.is_active == True, Link.expires_at <= now, batch_size=batch_size)
+    result = await db.execute(
+        update(Link)
+        .where(Link.id.in_(batch))
+        .values(is_active=False)
+        .returning(Link.short_code)
+        .execution_options(synchronize_session=False)
+    )
+    codes = result.scalars().all()
+    await db.commit()
+    return codes
+
+
+async def delete_batch(db, threshold: datetime, batch_size: int, links=Link.__table__) -> List[str]:
+    batch = locked_batch(links.c.is_active == False, links.c.expires_at <= threshold, batch_size=batch_size, links=links)
+    result = await db.execute(
+        delete(links)
+        .where(links.c.id.in_(batch))
+        .returning(links.c.short_code)
+        .execution_options(synchronize_session=False)
+    )
+    codes = result.scalars().all()
+    await db.commit()
+    return codes
+
+
+async def sweep_expired_links(
+                              session_factory,
+                              redis,
+                              batch_size: int = CLEANUP_BATCH_SIZE,
+                              time_budget: float = CLEANUP_TIME_BUDGET
+                             ) -> Tuple[int, int, bool]:
+    """Отключает истёкшие и удаляет давно отключённые ссылки пачками по batch_size.
+
+    Каждая пачка - своя короткая транзакция. Новую пачку после time_budget секунд не начинаем,
+    остаток разберёт следующий запуск. Возвращает (отключено, удалено, разобрано ли всё).
+    В секционированной links старые ссылки уходят целыми секциями, построчно - только из links_default.
+    """
+    deadline = time.monotonic() + time_budget
+    now = datetime.utcnow()
+    deactivated = deleted = 0
+
+    async with session_factory() as db:
+        partitioned = await links_partitioned(db)
+        if partitioned:
+            await ensure_partitions(db, now)
+
+        while time.monotonic() < deadline:
+            codes = await deactivate_batch(db, now, batch_size)
+            # ссылка истекла: из кэша теперь отдаём 410, а не 404 после промаха
+            await cache_markers(redis, codes, EXPIRED, EXPIRED_CACHE_TTL)
+            deactivated += len(codes)
+            if len(codes) < batch_size:
+                break
+        else:
+            return deactivated, deleted, False
+
+        # заодно старые почасовые счётчики, в том числе удалённых ссылок: по индексу на hour, одним запросом
+        await purge_rollups(db, now - timedelta(days=CLICK_ROLLUP_RETENTION_DAYS))
+        # ссылку удаляют через TTL_LINK дней после истечения, её снимок посетителей к тому времени не моложе
+        await purge_visitors(db, now - timedelta(days=TTL_LINK))
+
+        threshold = now - timedelta(days=TTL_LINK)
+        # в секционированной links построчно удаляем только из links_default, остальное - секциями
+        links = links_default if partitioned else Link.__table__
+        while time.monotonic() < deadline:
+            codes = await delete_batch(db, threshold, batch_size, links)
+            await evict_links(redis, codes)
+            deleted += len(codes)
+            if len(codes) < batch_size:
+                if partitioned:
+                    deleted += await purge_partitions(db, threshold)
+                return deactivated, deleted, True
+
+    return deactivated, deleted, False
+
+
+async def sweep_as_leader(session_factory, redis) -> Optional[Tuple[int, int, bool]]:
+    """Запускает sweep_expired_links, только если ни один другой процесс сейчас не чистит.
+
+    Лидер держит сессионный advisory lock на отдельном соединении, на нём же идут и пачки.
+    Если процесс упал, Postgres закрывает соединение и снимает блокировку сам, аренду продлевать не нужно.
+    Возвращает None, если блокировка у другого процесса.
+    """
+    async with session_factory.kw["bind"].connect() as conn:
+        if not await conn.scalar(select(func.pg_try_advisory_lock(CLEANUP_LOCK_ID))):
+            return None
+        await conn.commit()
+        try:
+            result = await sweep_expired_links(lambda: session_factory(bind=conn), redis)
+        except BaseException:
+            # ошибка или отмена посреди запроса: соединение с блокировкой не возвращаем в пул,
+            # а закрываем - Postgres снимет advisory lock вместе с сессией
+            await conn.invalidate()
+            raise
+        await conn.execute(select(func.pg_advisory_unlock(CLEANUP_LOCK_ID)))
+        await conn.commit()
+        return result
+
+
+async def cleanup_expired_links(loop_once: bool = False, session_factory=AsyncSessionLocal, redis=None):
     while True:
+        done = True
+        started = time.perf_counter()
         try:
-            db: Session = next(get_db())
-            now = datetime.utcnow()
-
-            deactivate_query = db.query(Link).filter(
-                and_(
-                    Link.expires_at <= now,
-                    Link.is_active == True
-                )
-            )
-            deactivate_query.update({"is_active": False})
-
-            delete_threshold = now - timedelta(days=TTL_LINK)
-            delete_query = db.query(Link).filter(
-                and_(
-                    Link.expires_at <= delete_threshold,
-                    Link.is_active == False
-                )
-            )
-            delete_count = delete_query.delete()
-            db.commit()
-            logger.info(f"Очистка: Отключено {deactivate_query.count()}, Удалено {delete_count}")
+            result = await sweep_as_leader(session_factory, redis or await get_redis())
+            if result is None:
+                CLEANUP_RUNS.labels("skipped").inc()
+                logger.info("Очистка: уже идёт в другом процессе, пропускаем")
+            else:
+                deactivated, deleted, done = result
+                CLEANUP_DURATION.observe(time.perf_counter() - started)
+                CLEANUP_RUNS.labels("ok" if done else "backlog").inc()
+                CLEANUP_ROWS.labels("deactivated").inc(deactivated)
+                CLEANUP_ROWS.labels("deleted").inc(deleted)
+                logger.info(f"Очистка: Отключено {deactivated}, Удалено {deleted}")
+            if not done:
+                logger.info(f"Очистка: не уложились в {CLEANUP_TIME_BUDGET} сек, продолжим через {CLEANUP_BACKLOG_DELAY} сек")
         except Exception as e:
-            db.rollback()
+            CLEANUP_RUNS.labels("error").inc()
             logger.error(f"Cleanup error: {str(e)}")
         if loop_once:
             break
-        await asyncio.sleep(CLEANUP_INTERVAL)
\ No newline at end of file
+        await asyncio.sleep(CLEANUP_INTERVAL if done else CLEANUP_BACKLOG_DELAY)
+
+
+async def main(loop_once: bool):
+    if CLEANER_METRICS_PORT:
+        start_http_server(CLEANER_METRICS_PORT)
+    await init_redis()
+    try:
+        await cleanup_expired_links(loop_once=loop_once)
+    finally:
+        await close_redis()
+        await close_db()
+
+
+if __name__ == "__main__":
+    # отдельный процесс чистильщика: python -m src.clean_exp_link [--once]
+    parser = argparse.ArgumentParser(description="Отключает истёкшие и удаляет старые ссылки")
+    parser.add_argument("--once", action="store_true", help="один проход вместо цикла раз в CLEANUP_INTERVAL")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main(args.once))
\ No newline at end of file
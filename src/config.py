@@ -11,8 +11,64 @@ DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 REDIS_URL = os.getenv("REDIS_URL")
 SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
 TTL = 30 # Time to live in min
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12)) # стоимость новых хэшей; старые проверяются со своей
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2)) # процессов под bcrypt на воркер API
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32)) # хэшей в работе и в очереди, сверх - 503
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000)) # проверенных JWT в локальном кэше воркера
 TTL_LINK = 1 # сначала переходит в состояние неактивности и через то же время удаляется(если не обновить)
 CLEANUP_INTERVAL = 86400 #sec
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", 1000)) # ссылок в одной транзакции чистильщика
+CLEANUP_TIME_BUDGET = int(os.getenv("CLEANUP_TIME_BUDGET", 300)) # sec на один запуск, остаток - следующему
+CLEANUP_BACKLOG_DELAY = int(os.getenv("CLEANUP_BACKLOG_DELAY", 60)) # sec до следующего запуска, если остались ссылки
+LINKS_PARTITIONING = os.getenv("LINKS_PARTITIONING", "") # day или week - секционировать links по expires_at (применяет миграция), пусто - обычная таблица
+LINKS_PARTITIONS_AHEAD = int(os.getenv("LINKS_PARTITIONS_AHEAD", 7)) # days, на сколько вперёд чистильщик заводит секции
+LINKS_PARTITION_PURGE = os.getenv("LINKS_PARTITION_PURGE", "drop") # drop - удалить старую секцию, detach - только отсоединить (архив)
+CLEANER_METRICS_PORT = int(os.getenv("CLEANER_METRICS_PORT", 0)) # порт /metrics отдельного чистильщика, 0 - не поднимать
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200)) # ms, запросы к базе дольше этого пишутся в лог, 0 - выключено
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "") # значение заголовка X-Profile, с которым запрос профилируется; пусто - выключено
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.001)) # sec между сэмплами профилировщика
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles") # куда сохранять профили запросов
+CLEANUP_IN_API = os.getenv("CLEANUP_IN_API", "true").lower() in ("1", "true", "yes") # false, если чистильщик запущен отдельным процессом
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50)) # размер пула на один воркер
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 1.0)) # sec, сколько ждать свободного соединения из пула
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5)) # sec
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 1.0)) # sec
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30)) # sec
+CLICK_FLUSH_INTERVAL = int(os.getenv("CLICK_FLUSH_INTERVAL", 5)) # sec, как часто воркер проверяет буфер кликов
+CLICK_FLUSH_MAX_STALENESS = int(os.getenv("CLICK_FLUSH_MAX_STALENESS", 60)) # sec, дольше этого клики в буфере не лежат
+CLICK_FLUSH_BATCH_SIZE = int(os.getenv("CLICK_FLUSH_BATCH_SIZE", 1000)) # ссылок в одном UPDATE
+CLICK_STREAM_MAXLEN = int(os.getenv("CLICK_STREAM_MAXLEN", 1_000_000)) # событий в потоке кликов, если агрегатор отстал
+CLICK_ROLLUP_INTERVAL = int(os.getenv("CLICK_ROLLUP_INTERVAL", 5)) # sec, как часто воркер разбирает поток в почасовые счётчики
+CLICK_ROLLUP_BATCH_SIZE = int(os.getenv("CLICK_ROLLUP_BATCH_SIZE", 5000)) # событий за одно чтение из потока
+CLICK_ROLLUP_CLAIM_IDLE = int(os.getenv("CLICK_ROLLUP_CLAIM_IDLE", 60)) # sec, после которых события упавшего воркера забирает другой
+CLICK_ROLLUP_RETENTION_DAYS = int(os.getenv("CLICK_ROLLUP_RETENTION_DAYS", 400)) # сколько хранить почасовые счётчики
+CLICK_SERIES_MAX_POINTS = int(os.getenv("CLICK_SERIES_MAX_POINTS", 2000)) # точек в одном ответе /links/{short_code}/clicks
+VISITORS_TTL_DAYS = int(os.getenv("VISITORS_TTL_DAYS", 30)) # HyperLogLog ссылки без переходов живёт в Redis столько, дальше - снимок в базе
+VISITORS_DAILY_DAYS = int(os.getenv("VISITORS_DAILY_DAYS", 0)) # дневные HyperLogLog для окон, до 12 КБ на ссылку за день; 0 - выключены
+VISITORS_SNAPSHOT_INTERVAL = int(os.getenv("VISITORS_SNAPSHOT_INTERVAL", 60)) # sec, как часто воркер сохраняет HyperLogLog в базу
+VISITORS_SNAPSHOT_BATCH_SIZE = int(os.getenv("VISITORS_SNAPSHOT_BATCH_SIZE", 500)) # ссылок за одно сохранение
+L1_CACHE_MAX_BYTES = int(os.getenv("L1_CACHE_MAX_BYTES", 16 * 1024 * 1024)) # потолок памяти локального кэша редиректов на воркер
+L1_CACHE_TTL = int(os.getenv("L1_CACHE_TTL", 60)) # sec, страховка на случай потерянной инвалидации
+REDIRECT_CACHE_TTL = 300 # sec, кэш найденной ссылки в Redis
+NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", 30)) # sec, кэш 404 на несуществующий код
+EXPIRED_CACHE_TTL = int(os.getenv("EXPIRED_CACHE_TTL", 300)) # sec, кэш 410 на истёкшую ссылку
+TOMBSTONE_TTL = int(os.getenv("TOMBSTONE_TTL", 3600)) # sec, метка удалённой ссылки
+REDIRECT_LOCK_TTL_MS = int(os.getenv("REDIRECT_LOCK_TTL_MS", 2000)) # аренда блокировки на загрузку ссылки из базы
+REDIRECT_LOCK_POLL_INTERVAL = 0.02 # sec, как часто ждущие воркеры проверяют кэш
+EARLY_REFRESH_BETA = float(os.getenv("EARLY_REFRESH_BETA", 1.0)) # >1 обновляет горячие ключи раньше, 0 отключает
+SHORT_CODE_ALLOCATOR = os.getenv("SHORT_CODE_ALLOCATOR", "hilo") # hilo - блоки id из sequence, random - случайный код с проверкой в базе
+SHORT_CODE_LENGTH = 8
+SHORT_CODE_BLOCK_SIZE = int(os.getenv("SHORT_CODE_BLOCK_SIZE", 1000)) # id, которые воркер резервирует за один nextval. На живой базе не менять
+SHORT_CODE_SCRAMBLE_KEY = int(os.getenv("SHORT_CODE_SCRAMBLE_KEY", 7919)) # чтобы коды не шли подряд
+BATCH_SHORTEN_MAX_ITEMS = int(os.getenv("BATCH_SHORTEN_MAX_ITEMS", 20000)) # ссылок в одном запросе /links/shorten/batch
+TAG_CACHE_SIZE = int(os.getenv("TAG_CACHE_SIZE", 10000)) # тегов в локальном кэше имя -> id
+TAG_CACHE_TTL = int(os.getenv("TAG_CACHE_TTL", 600)) # sec
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", 100)) # ссылок на странице поиска по умолчанию
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", 1000))
+SEARCH_STREAM_CHUNK_SIZE = int(os.getenv("SEARCH_STREAM_CHUNK_SIZE", 1000)) # строк, которые stream=true читает из курсора за раз
+LINKS_PAGE_SIZE = int(os.getenv("LINKS_PAGE_SIZE", 100)) # ссылок на странице /links/my и /links/exp_links
+LINKS_MAX_PAGE_SIZE = int(os.getenv("LINKS_MAX_PAGE_SIZE", 1000))
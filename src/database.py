@@ -1,15 +1,29 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from src.config import DATABASE_URL
+from prometheus_client import REGISTRY
+from src.config import ASYNC_DATABASE_URL
+from src.metrics import TimedQueuePool, PoolCollector
+from src.diagnostics import install_slow_query_log
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=TimedQueuePool)
+REGISTRY.register(PoolCollector(async_engine))
+install_slow_query_log(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+# для ответов, которые читают базу уже после выхода из эндпоинта (StreamingResponse):
+# сессия из get_db к этому моменту закрыта
+def get_session_factory():
+    return AsyncSessionLocal
+
+async def init_db():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+async def close_db():
+    await async_engine.dispose()
@@ -0,0 +1,126 @@
+"""Разбор задержек без передеплоя: лог медленных запросов к базе и профиль отдельного запроса по секретному заголовку."""
+import contextvars
+import logging
+import os
+import re
+import secrets
+import time
+from typing import Optional
+
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+from sqlalchemy import event
+
+from src.config import SLOW_QUERY_MS, PROFILE_SECRET, PROFILE_INTERVAL, PROFILE_DIR
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+
+# scope текущего HTTP-запроса: маршрут и path_params роутер дописывает в него уже после middleware
+current_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("current_scope", default=None)
+
+
+def request_origin() -> str:
+    scope = current_scope.get()
+    if scope is None:
+        return "вне запроса"
+    route = scope.get("route")
+    origin = route.path if route is not None else scope["path"]
+    short_code = scope.get("path_params", {}).get("short_code")
+    return f"{origin} (short_code={short_code})" if short_code else origin
+
+
+def install_slow_query_log(engine, threshold_ms: float = SLOW_QUERY_MS):
+    """Логирует запросы дольше threshold_ms вместе с маршрутом и кодом ссылки. 0 - выключено."""
+    if threshold_ms <= 0:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+        if elapsed_ms >= threshold_ms:
+            logger.warning(f"Медленный запрос {elapsed_ms:.1f} мс, {request_origin()}: {' '.join(statement.split())[:2000]}")
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # упавший запрос after_cursor_execute не получает, снимаем его отметку здесь
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+
+class RequestContextMiddleware:
+    """Кладёт scope запроса в current_scope, чтобы его видели хуки SQLAlchemy."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
+
+
+class ProfilerMiddleware:
+    """Запрос с заголовком X-Profile: <PROFILE_SECRET> проходит под сэмплирующим профилировщиком (pyinstrument).
+
+    Профиль в формате speedscope (открывается как flamegraph на speedscope.app) сохраняется в PROFILE_DIR,
+    имя файла возвращается в заголовке X-Profile-File. Одновременно профилируется не больше одного запроса.
+    """
+
+    def __init__(self, app, secret: str = PROFILE_SECRET, interval: float = PROFILE_INTERVAL, directory: str = PROFILE_DIR):
+        self.app = app
+        self.secret = secret.encode("utf-8")
+        self.interval = interval
+        self.directory = directory
+        self.busy = False
+
+    def _requested(self, scope) -> bool:
+        if not self.secret or self.busy or scope["type"] != "http":
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return secrets.compare_digest(value, self.secret)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self.busy = True
+        # заголовки ответа придерживаем, чтобы добавить к ним имя файла профиля
+        messages = []
+
+        async def buffered_send(message):
+            messages.append(message)
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, buffered_send)
+        finally:
+            profiler.stop()
+            self.busy = False
+
+        route = scope.get("route")
+        slug = re.sub(r"[^a-zA-Z0-9]+", "_", route.path if route is not None else scope["path"]).strip("_")
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug or 'root'}-{secrets.token_hex(3)}.speedscope.json"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, filename), "w", encoding="utf-8") as f:
+            f.write(profiler.output(SpeedscopeRenderer()))
+        logger.info(f"Профиль {scope['path']} сохранён в {filename}")
+
+        for message in messages:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-file", filename.encode("utf-8"))]}
+            await send(message)
@@ -1,17 +1,62 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from src.url.url import router as url_router
-from src.auth.auth import router as auth_router
+from src.auth.auth import router as auth_router, ensure_anonymous_user
+from src.auth.hashing import password_hasher
 from src.clean_exp_link import cleanup_expired_links
+from src.database import init_db, close_db
+from src.cache import init_redis, close_redis, get_redis
+from src.url.clicks import run_click_flusher, flush_clicks
+from src.url.click_stream import run_click_rollup
+from src.url.visitors import run_visitor_snapshots
+from src.url.redirect_cache import listen_invalidations
+from src.url.fast_redirect import RedirectFastPath
+from src.metrics import MetricsMiddleware
+from src.diagnostics import RequestContextMiddleware, ProfilerMiddleware
+from src.config import CLEANUP_IN_API
 import asyncio
 
 app = FastAPI()
+# самый внутренний: метрики и профилировщик видят и быстрые ответы
+app.add_middleware(RedirectFastPath, api=app)
+app.add_middleware(RequestContextMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilerMiddleware)
 
 app.include_router(auth_router, prefix="/auth")
 app.include_router(url_router, prefix="/api")
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(cleanup_expired_links())
+    await init_db()
+    await ensure_anonymous_user()
+    await init_redis()
+    app.state.invalidations_ready = asyncio.Event()
+    app.state.background = [
+        asyncio.create_task(run_click_flusher()),
+        asyncio.create_task(run_click_rollup()),
+        asyncio.create_task(run_visitor_snapshots()),
+        asyncio.create_task(listen_invalidations(app.state.invalidations_ready)),
+    ]
+    if CLEANUP_IN_API:
+        # между воркерами проход всё равно один (advisory lock), но можно вынести в python -m src.clean_exp_link
+        app.state.background.append(asyncio.create_task(cleanup_expired_links()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in app.state.background:
+        task.cancel()
+    await asyncio.gather(*app.state.background, return_exceptions=True)
+    try:
+        await flush_clicks(await get_redis(), force=True)
+    finally:
+        await close_redis()
+        await close_db()
+        password_hasher.close()
 
 if __name__ == "__main__":
     import uvicorn
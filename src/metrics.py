@@ -0,0 +1,124 @@
+"""Метрики Prometheus. API отдаёт их на GET /metrics, отдельный чистильщик - на CLEANER_METRICS_PORT.
+
+На пути редиректа только inc()/observe() у заранее привязанных меток: labels() на каждый запрос
+стоит дороже самого счётчика.
+"""
+import time
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter("http_requests_total", "Запросы по маршруту и статусу", ["method", "route", "status"])
+
+# layer: l1 - память воркера, redis. outcome: hit, negative_hit (метка 404/410/удалена),
+# miss, expired (запись L1 пережила свой TTL)
+REDIRECT_CACHE = Counter("redirect_cache_lookups_total", "Обращения к кэшу редиректов", ["layer", "outcome"])
+L1_HIT = REDIRECT_CACHE.labels("l1", "hit")
+L1_NEGATIVE_HIT = REDIRECT_CACHE.labels("l1", "negative_hit")
+L1_MISS = REDIRECT_CACHE.labels("l1", "miss")
+L1_EXPIRED = REDIRECT_CACHE.labels("l1", "expired")
+REDIS_HIT = REDIRECT_CACHE.labels("redis", "hit")
+REDIS_NEGATIVE_HIT = REDIRECT_CACHE.labels("redis", "negative_hit")
+REDIS_MISS = REDIRECT_CACHE.labels("redis", "miss")
+
+# чем закончилась загрузка ссылки из базы после промаха обоих слоёв
+REDIRECT_DB_LOOKUPS = Counter("redirect_db_lookups_total", "Загрузки ссылки из базы", ["result"])
+DB_FOUND = REDIRECT_DB_LOOKUPS.labels("found")
+DB_NOT_FOUND = REDIRECT_DB_LOOKUPS.labels("not_found")
+DB_EXPIRED = REDIRECT_DB_LOOKUPS.labels("expired")
+
+DB_POOL_WAIT = Histogram("db_pool_wait_seconds", "Ожидание соединения из пула SQLAlchemy", buckets=LATENCY_BUCKETS)
+
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds", "Время команды Redis (pipeline - целиком)", ["command"], buckets=LATENCY_BUCKETS
+)
+
+_redis_series = {}
+
+
+def observe_redis(command: str, seconds: float):
+    series = _redis_series.get(command)
+    if series is None:
+        series = _redis_series[command] = REDIS_LATENCY.labels(command)
+    series.observe(seconds)
+
+
+CLEANUP_DURATION = Histogram(
+    "cleanup_run_duration_seconds", "Длительность прохода чистильщика",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600),
+)
+CLEANUP_RUNS = Counter("cleanup_runs_total", "Проходы чистильщика", ["result"]) # ok, backlog, skipped, error
+CLEANUP_ROWS = Counter("cleanup_rows_total", "Ссылки, обработанные чистильщиком", ["action"]) # deactivated, deleted
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул asyncpg-соединений, который замеряет, сколько checkout ждал свободное соединение."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+
+class PoolCollector:
+    """Состояние пула читаем в момент сбора: engine.dispose() подменяет объект пула."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        pool = self.engine.pool
+        if not isinstance(pool, AsyncAdaptedQueuePool):
+            return
+        for name, doc, value in (
+            ("db_pool_size", "Размер пула SQLAlchemy", pool.size()),
+            ("db_pool_checked_out", "Соединения, выданные из пула", pool.checkedout()),
+            ("db_pool_overflow", "Соединения сверх размера пула", max(pool.overflow(), 0)),
+        ):
+            yield GaugeMetricFamily(name, doc, value=value)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время и статус запроса по шаблону маршрута (/api/links/{short_code}), а не по пути."""
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+        self._series = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # несовпавшие пути (сканеры) не плодят временные ряды
+            key = (scope["method"], route.path if route is not None else "unmatched", status_code)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = (
+                    REQUEST_LATENCY.labels(key[0], key[1]),
+                    REQUESTS.labels(key[0], key[1], str(status_code)),
+                )
+            series[0].observe(time.perf_counter() - started)
+            series[1].inc()
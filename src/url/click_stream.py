@@ -0,0 +1,173 @@
+import asyncio
+import datetime
+import logging
+import os
+import socket
+from collections import Counter
+from typing import List, Tuple
+
+from redis.exceptions import ResponseError
+from sqlalchemy import Integer, String, DateTime, bindparam, delete, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+
+from src.config import CLICK_ROLLUP_INTERVAL, CLICK_ROLLUP_BATCH_SIZE, CLICK_ROLLUP_CLAIM_IDLE
+from src.database import AsyncSessionLocal
+from src.cache import get_redis
+from src.url.models import Link, LinkClicksHourly
+
+logger = logging.getLogger(__name__)
+
+# Каждый переход дописывает в поток событие {c: short_code} (см. record_click), время события -
+# миллисекунды из id записи. Воркеры API читают поток одной группой потребителей, складывают события
+# в почасовые счётчики link_clicks_hourly и только после коммита подтверждают и удаляют их из потока.
+# Упал между коммитом и XACK - пачка учтётся повторно, как и в flush_clicks.
+CLICK_STREAM_KEY = "clicks:stream"
+ROLLUP_GROUP = "rollup"
+HOUR_MS = 3_600_000
+BUCKETS = {"hour": datetime.timedelta(hours=1), "day": datetime.timedelta(days=1)}
+# диапазон /links/{short_code}/clicks по умолчанию
+DEFAULT_RANGE = {"hour": datetime.timedelta(days=1), "day": datetime.timedelta(days=30)}
+
+
+def to_utc(moment: datetime.datetime) -> datetime.datetime:
+    """UTC без tzinfo, как хранятся даты в базе."""
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def truncate(moment: datetime.datetime, interval: str) -> datetime.datetime:
+    """Начало интервала (hour/day), в котором лежит moment."""
+    moment = to_utc(moment).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if interval == "day" else moment
+
+
+def consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def event_hour(entry_id: bytes) -> datetime.datetime:
+    ms = int(entry_id.split(b"-", 1)[0])
+    return datetime.datetime.utcfromtimestamp(ms // HOUR_MS * HOUR_MS / 1000)
+
+
+async def ensure_group(redis):
+    try:
+        await redis.xgroup_create(CLICK_STREAM_KEY, ROLLUP_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def read_events(redis, consumer: str, count: int) -> list:
+    # сначала свои неподтверждённые (прошлая запись в базу упала), потом брошенные упавшими воркерами, потом новые
+    response = await redis.xreadgroup(ROLLUP_GROUP, consumer, {CLICK_STREAM_KEY: "0"}, count=count)
+    entries = response[0][1] if response else []
+    if not entries:
+        claimed = await redis.xautoclaim(
+            CLICK_STREAM_KEY, ROLLUP_GROUP, consumer, CLICK_ROLLUP_CLAIM_IDLE * 1000, count=count
+        )
+        entries = claimed[1]
+    if not entries:
+        response = await redis.xreadgroup(ROLLUP_GROUP, consumer, {CLICK_STREAM_KEY: ">"}, count=count)
+        entries = response[0][1] if response else []
+    return entries
+
+
+async def write_rollups(session_factory, entries: list) -> int:
+    counts = Counter()
+    for entry_id, fields in entries:
+        # записи, удалённые до XAUTOCLAIM, приходят без полей
+        if fields:
+            counts[fields[b"c"].decode("utf-8"), event_hour(entry_id)] += 1
+    if not counts:
+        return 0
+
+    keys = list(counts)
+    source = func.unnest(
+        bindparam("short_code", [code for code, _ in keys], type_=ARRAY(String)),
+        bindparam("hour", [hour for _, hour in keys], type_=ARRAY(DateTime)),
+        bindparam("clicks", list(counts.values()), type_=ARRAY(Integer)),
+    ).table_valued("short_code", "hour", "clicks").render_derived()
+    # код -> id в том же запросе; клики по уже удалённым ссылкам отбрасываются джойном
+    insert = pg_insert(LinkClicksHourly).from_select(
+        ["link_id", "hour", "clicks"],
+        select(Link.id, source.c.hour, source.c.clicks).join(source, Link.short_code == source.c.short_code),
+    )
+    async with session_factory() as db:
+        await db.execute(insert.on_conflict_do_update(
+            index_elements=[LinkClicksHourly.link_id, LinkClicksHourly.hour],
+            set_={"clicks": LinkClicksHourly.clicks + insert.excluded.clicks},
+        ))
+        await db.commit()
+    return len(keys)
+
+
+async def rollup_clicks(redis, session_factory=AsyncSessionLocal, consumer: str = None,
+                        batch_size: int = CLICK_ROLLUP_BATCH_SIZE) -> int:
+    """Разбирает поток кликов пачками по batch_size, пока он не опустеет. Возвращает число событий."""
+    consumer = consumer or consumer_name()
+    # группа пропадает вместе с ключом (FLUSHDB, потеря данных Redis), создаём её каждый проход
+    await ensure_group(redis)
+    processed = 0
+    while True:
+        entries = await read_events(redis, consumer, batch_size)
+        if not entries:
+            return processed
+        await write_rollups(session_factory, entries)
+        ids = [entry_id for entry_id, _ in entries]
+        pipe = redis.pipeline(transaction=False)
+        pipe.xack(CLICK_STREAM_KEY, ROLLUP_GROUP, *ids)
+        pipe.xdel(CLICK_STREAM_KEY, *ids)
+        await pipe.execute()
+        processed += len(entries)
+        if len(entries) < batch_size:
+            return processed
+
+
+async def run_click_rollup():
+    consumer = consumer_name()
+    while True:
+        await asyncio.sleep(CLICK_ROLLUP_INTERVAL)
+        try:
+            processed = await rollup_clicks(await get_redis(), consumer=consumer)
+            if processed:
+                logger.info(f"Клики: в почасовые счётчики разобрано {processed} событий")
+        except Exception as e:
+            logger.error(f"Click rollup error: {str(e)}")
+
+
+async def click_series(db, link_id: int, start: datetime.datetime, end: datetime.datetime,
+                       interval: str) -> List[Tuple[datetime.datetime, int]]:
+    """Клики по интервалам [start, end) только из почасовых счётчиков, пустые интервалы - нулями.
+
+    start должен быть выровнен по началу интервала.
+    """
+    bucket = func.date_trunc(interval, LinkClicksHourly.hour).label("bucket")
+    result = await db.execute(
+        select(bucket, func.sum(LinkClicksHourly.clicks))
+        .where(
+               LinkClicksHourly.link_id == link_id,
+               LinkClicksHourly.hour >= start,
+               LinkClicksHourly.hour < end
+              )
+        .group_by(bucket)
+    )
+    clicks = dict(result.all())
+    step = BUCKETS[interval]
+    points = []
+    moment = start
+    while moment < end:
+        points.append((moment, int(clicks.get(moment, 0))))
+        moment += step
+    return points
+
+
+async def purge_rollups(db, before: datetime.datetime) -> int:
+    result = await db.execute(
+        delete(LinkClicksHourly)
+        .where(LinkClicksHourly.hour < before)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
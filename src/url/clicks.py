@@ -0,0 +1,161 @@
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+from typing import Optional, Tuple
+
+from sqlalchemy import Integer, String, DateTime, column, delete, func, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.config import CLICK_FLUSH_INTERVAL, CLICK_FLUSH_MAX_STALENESS, CLICK_FLUSH_BATCH_SIZE, CLICK_STREAM_MAXLEN
+from src.database import AsyncSessionLocal
+from src.cache import get_redis, acquire_lock, release_lock
+from src.url.models import Link, ClickFlush
+from src.url.click_stream import CLICK_STREAM_KEY
+from src.url.visitors import add_visit
+
+logger = logging.getLogger(__name__)
+
+# Клики копятся в Redis (общий буфер для всех воркеров) и периодически пишутся в links пачками.
+# pending -> flushing переименовывается атомарно, поэтому новые клики во время сброса не теряются.
+# У каждого сброса свой id, он пишется в click_flushes той же транзакцией, что и клики: если сброс
+# повторят (блокировка истекла посреди долгого сброса, воркер упал между commit и удалением ключей),
+# второй раз клики не прибавятся.
+PENDING_CLICKS_KEY = "clicks:pending"
+PENDING_LAST_USED_KEY = "clicks:pending:last_used"
+PENDING_SINCE_KEY = "clicks:pending:since"
+FLUSHING_CLICKS_KEY = "clicks:flushing"
+FLUSHING_LAST_USED_KEY = "clicks:flushing:last_used"
+FLUSHING_ID_KEY = "clicks:flushing:id"
+FLUSH_LOCK_KEY = "clicks:flush_lock"
+FLUSH_LOCK_TTL = 30 # sec
+# повтор сброса возможен, пока в Redis лежит его flushing, то есть до следующего сброса
+FLUSH_ID_RETENTION = datetime.timedelta(days=1)
+
+# удаляем flushing, только если это всё ещё наш сброс, а не следующий
+DELETE_FLUSHED_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1], KEYS[2], KEYS[3])
+end
+return 0
+"""
+
+
+async def record_click(redis, short_code: str, visitor: Optional[bytes] = None):
+    """visitor - visitor_key() посетителя для подсчёта уникальных, None - не считать."""
+    now = time.time()
+    pipe = redis.pipeline(transaction=True)
+    pipe.hincrby(PENDING_CLICKS_KEY, short_code, 1)
+    pipe.hset(PENDING_LAST_USED_KEY, short_code, now)
+    pipe.set(PENDING_SINCE_KEY, now, nx=True)
+    # событие для почасовой статистики, тем же запросом в Redis
+    pipe.xadd(CLICK_STREAM_KEY, {"c": short_code}, maxlen=CLICK_STREAM_MAXLEN, approximate=True)
+    if visitor is not None:
+        add_visit(pipe, short_code, visitor)
+    await pipe.execute()
+
+
+async def get_pending_clicks(redis, short_code: str) -> Tuple[int, Optional[datetime.datetime]]:
+    pipe = redis.pipeline(transaction=False)
+    pipe.hget(PENDING_CLICKS_KEY, short_code)
+    pipe.hget(FLUSHING_CLICKS_KEY, short_code)
+    pipe.hget(PENDING_LAST_USED_KEY, short_code)
+    pipe.hget(FLUSHING_LAST_USED_KEY, short_code)
+    pending, flushing, pending_ts, flushing_ts = await pipe.execute()
+
+    clicks = int(pending or 0) + int(flushing or 0)
+    timestamps = [float(ts) for ts in (pending_ts, flushing_ts) if ts]
+    last_used_at = datetime.datetime.utcfromtimestamp(max(timestamps)) if timestamps else None
+    return clicks, last_used_at
+
+
+async def _take_pending(redis, force: bool) -> bool:
+    if await redis.exists(FLUSHING_CLICKS_KEY):
+        # прошлый сброс не дошёл до конца, сначала дописываем его (id нет, если его начала прежняя версия)
+        await redis.set(FLUSHING_ID_KEY, uuid.uuid4().hex, nx=True)
+        return True
+    if not await redis.exists(PENDING_CLICKS_KEY):
+        return False
+    if not force:
+        since = await redis.get(PENDING_SINCE_KEY)
+        stale = since is not None and time.time() - float(since) >= CLICK_FLUSH_MAX_STALENESS
+        if not stale and await redis.hlen(PENDING_CLICKS_KEY) < CLICK_FLUSH_BATCH_SIZE:
+            return False
+    pipe = redis.pipeline(transaction=True)
+    pipe.rename(PENDING_CLICKS_KEY, FLUSHING_CLICKS_KEY)
+    pipe.rename(PENDING_LAST_USED_KEY, FLUSHING_LAST_USED_KEY)
+    pipe.set(FLUSHING_ID_KEY, uuid.uuid4().hex)
+    pipe.delete(PENDING_SINCE_KEY)
+    await pipe.execute()
+    return True
+
+
+async def flush_clicks(redis, session_factory=AsyncSessionLocal, force: bool = False) -> int:
+    token = await acquire_lock(redis, FLUSH_LOCK_KEY, FLUSH_LOCK_TTL * 1000)
+    if token is None:
+        return 0
+    try:
+        if not await _take_pending(redis, force):
+            return 0
+
+        pipe = redis.pipeline(transaction=True)
+        pipe.hgetall(FLUSHING_CLICKS_KEY)
+        pipe.hgetall(FLUSHING_LAST_USED_KEY)
+        pipe.get(FLUSHING_ID_KEY)
+        clicks, last_used, flush_id = await pipe.execute()
+        if not clicks or flush_id is None:
+            return 0
+        rows = [
+            (
+                code.decode("utf-8"),
+                int(delta),
+                datetime.datetime.utcfromtimestamp(float(last_used[code])) if code in last_used else None,
+            )
+            for code, delta in clicks.items()
+        ]
+
+        now = datetime.datetime.utcnow()
+        async with session_factory() as db:
+            # параллельный повтор ждёт на первичном ключе, пока первый сброс не закоммитится
+            applied = await db.execute(
+                pg_insert(ClickFlush)
+                .values(flush_id=flush_id.decode("utf-8"), flushed_at=now)
+                .on_conflict_do_nothing()
+                .returning(ClickFlush.flush_id)
+            )
+            if applied.first() is None:
+                rows = []
+            for start in range(0, len(rows), CLICK_FLUSH_BATCH_SIZE):
+                batch = values(
+                    column("short_code", String),
+                    column("delta", Integer),
+                    column("last_used_at", DateTime),
+                    name="pending",
+                ).data(rows[start:start + CLICK_FLUSH_BATCH_SIZE])
+                await db.execute(
+                    update(Link)
+                    .where(Link.short_code == batch.c.short_code)
+                    .values(
+                        clicks=func.coalesce(Link.clicks, 0) + batch.c.delta,
+                        last_used_at=func.greatest(Link.last_used_at, batch.c.last_used_at),
+                    )
+                )
+            await db.execute(delete(ClickFlush).where(ClickFlush.flushed_at < now - FLUSH_ID_RETENTION))
+            await db.commit()
+
+        await redis.eval(DELETE_FLUSHED_SCRIPT, 3, FLUSHING_ID_KEY, FLUSHING_CLICKS_KEY, FLUSHING_LAST_USED_KEY, flush_id)
+        return len(rows)
+    finally:
+        await release_lock(redis, FLUSH_LOCK_KEY, token)
+
+
+async def run_click_flusher():
+    while True:
+        await asyncio.sleep(CLICK_FLUSH_INTERVAL)
+        try:
+            flushed = await flush_clicks(await get_redis())
+            if flushed:
+                logger.info(f"Клики: записано {flushed} ссылок")
+        except Exception as e:
+            logger.error(f"Click flush error: {str(e)}")
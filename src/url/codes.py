@@ -0,0 +1,88 @@
+import asyncio
+import secrets
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import SHORT_CODE_ALLOCATOR, SHORT_CODE_LENGTH, SHORT_CODE_BLOCK_SIZE, SHORT_CODE_SCRAMBLE_KEY
+from src.url.models import Link, short_code_seq
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+CODE_SPACE = len(ALPHABET) ** SHORT_CODE_LENGTH
+# взаимно просто с 62^n, поэтому id -> код биекция и коды не повторяются
+SCRAMBLE_MULTIPLIER = 86206207853845
+
+
+def generate_short_code(length: int = SHORT_CODE_LENGTH) -> str:
+    return ''.join(secrets.choice(ALPHABET) for _ in range(length))
+
+
+def encode_id(value: int, length: int = SHORT_CODE_LENGTH) -> str:
+    space = len(ALPHABET) ** length
+    if not 0 <= value < space:
+        raise ValueError(f"id {value} не помещается в {length} символов")
+    value = (value * SCRAMBLE_MULTIPLIER + SHORT_CODE_SCRAMBLE_KEY) % space
+    chars = []
+    for _ in range(length):
+        value, rest = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[rest])
+    return ''.join(reversed(chars))
+
+
+class CodeAllocator(ABC):
+    @abstractmethod
+    async def allocate(self, db: AsyncSession) -> str:
+        ...
+
+    async def allocate_many(self, db: AsyncSession, count: int) -> List[str]:
+        return [await self.allocate(db) for _ in range(count)]
+
+
+class RandomCodeAllocator(CodeAllocator):
+    """Старый режим: случайный код, занятость проверяется запросом в базу."""
+
+    async def allocate(self, db: AsyncSession) -> str:
+        short_code = generate_short_code()
+        while await db.scalar(select(Link.id).where(Link.short_code == short_code)):
+            short_code = generate_short_code()
+        return short_code
+
+
+class HiLoCodeAllocator(CodeAllocator):
+    """Воркер берёт из short_code_seq номер блока и раздаёт id из него локально, без запросов на каждый код."""
+
+    def __init__(self, block_size: int = SHORT_CODE_BLOCK_SIZE):
+        self.block_size = block_size
+        self._next_id: Optional[int] = None
+        self._block_end = 0
+        self._lock = asyncio.Lock()
+
+    async def next_id(self, db: AsyncSession) -> int:
+        async with self._lock:
+            if self._next_id is None or self._next_id >= self._block_end:
+                block = await db.scalar(select(short_code_seq.next_value()))
+                self._next_id = block * self.block_size
+                self._block_end = self._next_id + self.block_size
+            value = self._next_id
+            self._next_id += 1
+            return value
+
+    async def allocate(self, db: AsyncSession) -> str:
+        return encode_id(await self.next_id(db))
+
+    async def allocate_many(self, db: AsyncSession, count: int) -> List[str]:
+        # на всю пачку не больше ceil(count / block_size) + 1 запросов nextval
+        return [encode_id(await self.next_id(db)) for _ in range(count)]
+
+
+def get_code_allocator(name: str = SHORT_CODE_ALLOCATOR) -> CodeAllocator:
+    if name == "random":
+        return RandomCodeAllocator()
+    if name == "hilo":
+        return HiLoCodeAllocator()
+    raise ValueError(f"Неизвестный SHORT_CODE_ALLOCATOR: {name}")
+
+
+code_allocator = get_code_allocator()
@@ -0,0 +1,117 @@
+import inspect
+import json
+from urllib.parse import quote
+
+from fastapi.routing import APIRoute
+
+from src.cache import get_redis
+from src.url.clicks import record_click
+from src.url.redirect_cache import redirect_cache, NOT_FOUND, EXPIRED, DELETED
+from src.url.visitors import visitor_key
+
+# те же символы, что оставляет без кодирования starlette.responses.RedirectResponse
+LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+
+
+def json_error(status_code: int, detail: str) -> tuple:
+    """Ответ в том же виде, что HTTPException после обработчика FastAPI."""
+    body = json.dumps({"detail": detail}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    headers = [(b"content-length", str(len(body)).encode("latin-1")), (b"content-type", b"application/json")]
+    return {"type": "http.response.start", "status": status_code, "headers": headers}, body
+
+
+class RedirectFastPath:
+    """ASGI-middleware для GET /api/links/{short_code}: попадание в L1-кэш отвечает сразу, минуя роутинг FastAPI.
+
+    Без сессии БД, без зависимостей и без RedirectResponse: 307 с заранее собранным заголовком Location
+    (или 404/410 для меток). При промахе запрос уходит в обычный обработчик, он же ходит в Redis и в базу.
+    Клик пишется после отправки ответа, как фоновой задачей в обработчике.
+    """
+
+    def __init__(self, app, api, path: str = "/api/links/{short_code}", max_locations: int = 10_000):
+        self.app = app
+        # FastAPI-приложение: маршруты и dependency_overrides (в тестах и бенчмарке Redis подменяют через них)
+        self.api = api
+        self.route = None
+        shadowed = set()
+        for route in api.routes:
+            if not isinstance(route, APIRoute) or "GET" not in route.methods:
+                continue
+            if route.path == path:
+                self.route = route
+                break
+            # статические маршруты, объявленные раньше (/api/links/search), роутер выбирает первыми
+            if "{" not in route.path:
+                shadowed.add(route.path)
+        if self.route is None:
+            raise RuntimeError(f"Маршрут {path} не найден")
+        self.prefix = path[:path.index("{")]
+        self.shadowed = shadowed
+        self.max_locations = max_locations
+        self._locations = {}
+        self._errors = {
+            NOT_FOUND: json_error(404, "Ссылка не найдена"),
+            DELETED: json_error(404, "Ссылка не найдена"),
+            EXPIRED: json_error(410, "Ссылка истекла"),
+        }
+
+    def _redirect_start(self, url: bytes) -> dict:
+        start = self._locations.get(url)
+        if start is None:
+            if len(self._locations) >= self.max_locations:
+                # без LRU: горячие адреса соберутся заново за пару запросов
+                self._locations.clear()
+            location = quote(url.decode("utf-8"), safe=LOCATION_SAFE).encode("latin-1")
+            start = self._locations[url] = {
+                "type": "http.response.start",
+                "status": 307,
+                "headers": [(b"content-length", b"0"), (b"location", location)],
+            }
+        return start
+
+    def _short_code(self, scope):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return None
+        path = scope["path"]
+        root_path = scope.get("root_path")
+        if root_path and path.startswith(root_path + "/"):
+            path = path[len(root_path):]
+        if not path.startswith(self.prefix) or path in self.shadowed:
+            return None
+        short_code = path[len(self.prefix):]
+        if not short_code or "/" in short_code:
+            return None
+        return short_code
+
+    async def __call__(self, scope, receive, send):
+        short_code = self._short_code(scope)
+        cached = redirect_cache.get(short_code, record_miss=False) if short_code else None
+        if cached is None:
+            await self.app(scope, receive, send)
+            return
+
+        # для MetricsMiddleware и логов - как будто запрос прошёл через роутер
+        scope["route"] = self.route
+        scope["path_params"] = {"short_code": short_code}
+        error = self._errors.get(cached)
+        if error is not None:
+            start, body = error
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        await send(self._redirect_start(cached))
+        await send({"type": "http.response.body", "body": b""})
+        await record_click(await self._redis(), short_code, self._visitor(scope))
+
+    @staticmethod
+    def _visitor(scope) -> bytes:
+        # то же, что request.client.host и request.headers["user-agent"] в обработчике
+        client = scope.get("client")
+        user_agent = next((value for name, value in scope["headers"] if name == b"user-agent"), b"")
+        return visitor_key(client[0] if client else "", user_agent.decode("latin-1"))
+
+    async def _redis(self):
+        provider = self.api.dependency_overrides.get(get_redis, get_redis)
+        redis = provider()
+        return await redis if inspect.isawaitable(redis) else redis
@@ -1,6 +1,23 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, ForeignKey, func
-from sqlalchemy.orm import relationship
-from src.database import Base, engine, SessionLocal
+import urllib.parse
+from typing import Optional
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, LargeBinary, ForeignKey, Sequence, Index, DDL, event, func, text
+from sqlalchemy.orm import relationship, validates
+from src.database import Base
+
+# номера блоков для генерации коротких кодов (см. src/url/codes.py)
+short_code_seq = Sequence("short_code_seq", metadata=Base.metadata)
+
+# триграммный индекс для поиска подстроки в original_url
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+def extract_host(url: str) -> Optional[str]:
+    if "://" not in url:
+        url = "//" + url
+    try:
+        return urllib.parse.urlsplit(url).hostname
+    except ValueError:
+        return None
 
 
 class Link(Base):
@@ -13,6 +30,7 @@ class Link(Base):
     clicks = Column(Integer, default=0)
     expires_at = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True)
+    host = Column(String, nullable=True, index=True)
 
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     tag_id = Column(Integer, ForeignKey("tags.id"), nullable=True)
@@ -22,6 +40,54 @@ class Link(Base):
 
     user = relationship("User", back_populates="links", overlaps="owner")
 
+    __table_args__ = (
+        Index("ix_links_original_url_trgm", text("lower(original_url) gin_trgm_ops"), postgresql_using="gin"),
+        # keyset-пагинация поиска (src/url/pagination.py)
+        Index("ix_links_created_at_id", "created_at", "id"),
+        # списки ссылок владельца: /links/my, /links/exp_links
+        Index("ix_links_owner_active_expires", owner_id, is_active, expires_at.desc(), id.desc()),
+        # чистильщик выбирает истёкшие активные и давно отключённые ссылки (src/clean_exp_link.py)
+        Index("ix_links_active_expires", is_active, expires_at),
+    )
+
+    @validates("original_url")
+    def _set_host(self, key, original_url):
+        self.host = extract_host(original_url)
+        return original_url
+
+class LinkClicksHourly(Base):
+    """Почасовые счётчики переходов, их пишет агрегатор потока кликов (src/url/click_stream.py)."""
+    __tablename__ = "link_clicks_hourly"
+    # без внешнего ключа: links может быть секционирована, а у секционированной таблицы нет уникального id.
+    # Строки удалённых ссылок уходят по CLICK_ROLLUP_RETENTION_DAYS
+    link_id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    clicks = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_link_clicks_hourly_hour", hour),
+    )
+
+class LinkVisitors(Base):
+    """Снимок HyperLogLog уникальных посетителей ссылки из Redis (src/url/visitors.py)."""
+    __tablename__ = "link_visitors"
+    # внешнего ключа нет по той же причине, что у link_clicks_hourly
+    link_id = Column(Integer, primary_key=True)
+    hll = Column(LargeBinary, nullable=False) # не больше 12 КБ (плотное представление Redis)
+    unique_visitors = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=func.now())
+
+    __table_args__ = (
+        # чистильщик ищет снимки удалённых ссылок среди давно не обновлявшихся
+        Index("ix_link_visitors_updated_at", updated_at),
+    )
+
+class ClickFlush(Base):
+    """Применённые сбросы буфера кликов (src/url/clicks.py): повтор того же сброса ничего не прибавит."""
+    __tablename__ = "click_flushes"
+    flush_id = Column(String, primary_key=True)
+    flushed_at = Column(DateTime, nullable=False, default=func.now())
+
 class Tag(Base):
     __tablename__ = "tags"
     id = Column(Integer, primary_key=True, index=True)
@@ -29,4 +95,7 @@ class Tag(Base):
 
     links = relationship("Link", back_populates="tag")
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    __table_args__ = (
+        # поиск и upsert тегов идут по lower(name)
+        Index("ix_tags_name_lower", func.lower(name), unique=True),
+    )
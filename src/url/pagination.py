@@ -0,0 +1,47 @@
+import base64
+import datetime
+from typing import Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+from src.url.models import Link
+
+
+# курсор - непрозрачная строка с (дата сортировки, id) последней отданной ссылки
+def encode_cursor(sort_value: datetime.datetime, link_id: int) -> str:
+    raw = f"{sort_value.isoformat()}|{link_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        sort_value, link_id = raw.split("|")
+        return datetime.datetime.fromisoformat(sort_value), int(link_id)
+    except ValueError:
+        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Некорректный курсор"
+                            )
+
+
+def keyset(query, cursor: str = None, sort_column=Link.created_at):
+    """Сортирует по (sort_column, id) по убыванию и начинает после ссылки из курсора.
+
+    Сравнение идёт по индексу (ix_links_created_at_id, ix_links_owner_active_expires),
+    поэтому страница в глубине выдачи стоит столько же, сколько первая, в отличие от OFFSET.
+    Колонка не должна быть NULL: такие строки сравнение кортежей отбрасывает.
+    """
+    if cursor:
+        sort_value, link_id = decode_cursor(cursor)
+        query = query.where(tuple_(sort_column, Link.id) < (sort_value, link_id))
+    return query.order_by(sort_column.desc(), Link.id.desc())
+
+
+def next_cursor(rows, limit: int, sort_key: str = "created_at"):
+    """Отрезает лишнюю строку (запрос шёл с limit + 1) и возвращает курсор следующей страницы."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], sort_key), rows[-1].id)
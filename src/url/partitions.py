@@ -0,0 +1,217 @@
+"""Секционирование links по expires_at (LINKS_PARTITIONING=day|week).
+
+Почти все записи в links со временем удаляет чистильщик, и построчный DELETE раздувает таблицу и индексы.
+В секционированной схеме старые ссылки уходят целой секцией (DROP/DETACH PARTITION).
+
+Уникальный индекс секционированной таблицы обязан включать ключ секционирования, поэтому
+уникальность short_code между секциями держит узкая таблица link_codes и триггер на вставку.
+"""
+import datetime
+import logging
+import re
+from typing import Iterator, Tuple
+
+from sqlalchemy import Boolean, DateTime, Integer, String, column, table, text
+from sqlalchemy.schema import CreateIndex
+
+from src.config import LINKS_PARTITIONING, LINKS_PARTITIONS_AHEAD, LINKS_PARTITION_PURGE
+from src.url.models import Link
+
+logger = logging.getLogger(__name__)
+
+PERIOD_DAYS = {"day": 1, "week": 7}
+# с этим флагом триггер пропускает строки с занятым кодом вместо ошибки, как ON CONFLICT DO NOTHING
+SKIP_CODE_CONFLICTS = "shorturl.skip_code_conflicts"
+
+# Второй PERFORM: UPDATE expires_at переносит строку в другую секцию как DELETE + INSERT,
+# и код уже принадлежит этой же ссылке.
+CLAIM_CODE_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION links_claim_short_code() RETURNS trigger AS $$
+BEGIN
+    IF NEW.short_code IS NULL THEN
+        RETURN NEW;
+    END IF;
+    INSERT INTO link_codes (short_code, link_id) VALUES (NEW.short_code, NEW.id)
+    ON CONFLICT (short_code) DO NOTHING;
+    IF FOUND THEN
+        RETURN NEW;
+    END IF;
+    PERFORM 1 FROM link_codes WHERE short_code = NEW.short_code AND link_id = NEW.id;
+    IF FOUND THEN
+        RETURN NEW;
+    END IF;
+    IF current_setting('{SKIP_CODE_CONFLICTS}', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    RAISE unique_violation USING
+        MESSAGE = 'duplicate key value violates unique constraint "link_codes_pkey"',
+        DETAIL = format('Key (short_code)=(%s) already exists.', NEW.short_code),
+        CONSTRAINT = 'link_codes_pkey';
+END
+$$ LANGUAGE plpgsql
+"""
+
+# При переносе между секциями строка к этому моменту уже лежит в новой секции, код не отпускаем.
+RELEASE_CODE_FUNCTION = """
+CREATE OR REPLACE FUNCTION links_release_short_code() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM link_codes
+    WHERE short_code = OLD.short_code AND link_id = OLD.id
+      AND NOT EXISTS (SELECT 1 FROM links WHERE id = OLD.id AND short_code = OLD.short_code);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PARTITION_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+# секция по умолчанию: ссылки без expires_at и вне созданных диапазонов, целиком её не убрать
+links_default = table(
+    "links_default",
+    column("id", Integer),
+    column("short_code", String),
+    column("is_active", Boolean),
+    column("expires_at", DateTime),
+)
+
+
+def period_start(moment: datetime.datetime, granularity: str) -> datetime.datetime:
+    day = datetime.datetime.combine(moment.date(), datetime.time())
+    if granularity == "week":
+        day -= datetime.timedelta(days=day.weekday())
+    return day
+
+
+def partition_ranges(
+                     start: datetime.datetime,
+                     end: datetime.datetime,
+                     granularity: str
+                    ) -> Iterator[Tuple[str, datetime.datetime, datetime.datetime]]:
+    """(имя, начало, конец) секций, покрывающих [start, end]."""
+    step = datetime.timedelta(days=PERIOD_DAYS[granularity])
+    lower = period_start(start, granularity)
+    while lower <= end:
+        yield f"links_p{lower:%Y%m%d}", lower, lower + step
+        lower += step
+
+
+def create_partition_sql(name: str, lower: datetime.datetime, upper: datetime.datetime) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF links "
+        f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+    )
+
+
+def partition_links(conn, granularity: str, now: datetime.datetime = None):
+    """Переводит links в секционированную схему. Синхронное соединение, вызывается из миграции.
+
+    Данные копируются одним INSERT ... SELECT, на время миграции запись в links останавливается.
+    """
+    now = now or datetime.datetime.utcnow()
+    conn.execute(text("ALTER TABLE links RENAME TO links_unpartitioned"))
+    conn.execute(text(
+        "CREATE TABLE links (LIKE links_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (expires_at)"
+    ))
+    conn.execute(text(
+        "ALTER TABLE links "
+        "ADD CONSTRAINT links_owner_id_fkey FOREIGN KEY (owner_id) REFERENCES users (id), "
+        "ADD CONSTRAINT links_tag_id_fkey FOREIGN KEY (tag_id) REFERENCES tags (id)"
+    ))
+    conn.execute(text(f"CREATE TABLE {links_default.name} PARTITION OF links DEFAULT"))
+
+    oldest, newest = conn.execute(text("SELECT min(expires_at), max(expires_at) FROM links_unpartitioned")).one()
+    ahead = now + datetime.timedelta(days=LINKS_PARTITIONS_AHEAD)
+    for name, lower, upper in partition_ranges(min(oldest or now, now), max(newest or ahead, ahead), granularity):
+        conn.execute(text(create_partition_sql(name, lower, upper)))
+
+    conn.execute(text("INSERT INTO links SELECT * FROM links_unpartitioned"))
+    conn.execute(text("ALTER SEQUENCE links_id_seq OWNED BY links.id"))
+    conn.execute(text("DROP TABLE links_unpartitioned"))
+
+    # индексы модели; уникальный индекс по short_code секционированной таблице недоступен
+    for index in Link.__table__.indexes:
+        ddl = str(CreateIndex(index).compile(dialect=conn.dialect))
+        conn.execute(text(ddl.replace("CREATE UNIQUE INDEX", "CREATE INDEX", 1)))
+
+    conn.execute(text("CREATE TABLE link_codes (short_code VARCHAR PRIMARY KEY, link_id INTEGER NOT NULL)"))
+    conn.execute(text(
+        "INSERT INTO link_codes (short_code, link_id) SELECT short_code, id FROM links WHERE short_code IS NOT NULL"
+    ))
+    conn.execute(text(CLAIM_CODE_FUNCTION))
+    conn.execute(text(RELEASE_CODE_FUNCTION))
+    conn.execute(text(
+        "CREATE TRIGGER links_claim_short_code BEFORE INSERT ON links "
+        "FOR EACH ROW EXECUTE FUNCTION links_claim_short_code()"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER links_release_short_code AFTER DELETE ON links "
+        "FOR EACH ROW EXECUTE FUNCTION links_release_short_code()"
+    ))
+
+
+def unpartition_links(conn):
+    """Обратно в обычную таблицу links, как её описывает модель."""
+    conn.execute(text("DROP TABLE link_codes"))
+    conn.execute(text("ALTER TABLE links RENAME TO links_partitioned"))
+    for index in Link.__table__.indexes:
+        conn.execute(text(f"ALTER INDEX IF EXISTS {index.name} RENAME TO {index.name}_partitioned"))
+    conn.execute(text("ALTER SEQUENCE links_id_seq RENAME TO links_partitioned_id_seq"))
+
+    Link.__table__.create(conn)
+    columns = ", ".join(column.name for column in Link.__table__.columns)
+    conn.execute(text(f"INSERT INTO links ({columns}) SELECT {columns} FROM links_partitioned"))
+    conn.execute(text("SELECT setval('links_id_seq', coalesce(max(id), 0) + 1, false) FROM links"))
+
+    conn.execute(text("DROP TABLE links_partitioned CASCADE"))
+    conn.execute(text("DROP FUNCTION links_claim_short_code()"))
+    conn.execute(text("DROP FUNCTION links_release_short_code()"))
+
+
+async def links_partitioned(db) -> bool:
+    result = await db.execute(text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('links')"))
+    return bool(result.scalar())
+
+
+async def ensure_partitions(db, now: datetime.datetime, granularity: str = LINKS_PARTITIONING or "day") -> int:
+    """Создаёт секции с текущего периода на LINKS_PARTITIONS_AHEAD дней вперёд. Возвращает число новых."""
+    created = 0
+    for name, lower, upper in partition_ranges(now, now + datetime.timedelta(days=LINKS_PARTITIONS_AHEAD), granularity):
+        exists = await db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name})
+        if exists.scalar():
+            continue
+        try:
+            await db.execute(text(create_partition_sql(name, lower, upper)))
+            await db.commit()
+            created += 1
+        except Exception as e:
+            # например, в links_default уже лежат строки этого диапазона
+            await db.rollback()
+            logger.error(f"Не удалось создать секцию {name}: {str(e)}")
+    return created
+
+
+async def purge_partitions(db, threshold: datetime.datetime, mode: str = LINKS_PARTITION_PURGE) -> int:
+    """Убирает секции, все ссылки которых истекли раньше threshold. Возвращает число ссылок в них.
+
+    Кэш редиректов не трогаем: url в кэше живёт не дольше expires_at, а метки EXPIRED -
+    EXPIRED_CACHE_TTL, к моменту удаления секции их уже нет.
+    """
+    result = await db.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'links'::regclass"
+    ))
+    purged = 0
+    for name, bound in result.all():
+        match = PARTITION_BOUND.search(bound)
+        if not match or datetime.datetime.fromisoformat(match.group(2)) > threshold:
+            continue
+        released = await db.execute(text(
+            f"DELETE FROM link_codes c USING {name} p WHERE c.short_code = p.short_code AND c.link_id = p.id"
+        ))
+        await db.execute(text(f"ALTER TABLE links DETACH PARTITION {name}"))
+        if mode == "drop":
+            await db.execute(text(f"DROP TABLE {name}"))
+        await db.commit()
+        purged += released.rowcount
+        logger.info(f"Секция {name} ({released.rowcount} ссылок): {'удалена' if mode == 'drop' else 'отсоединена'}")
+    return purged
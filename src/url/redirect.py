@@ -0,0 +1,136 @@
+import asyncio
+import datetime
+import time
+from typing import Optional, Tuple
+
+from fastapi import BackgroundTasks
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import (
+    REDIRECT_CACHE_TTL,
+    NEGATIVE_CACHE_TTL,
+    EXPIRED_CACHE_TTL,
+    REDIRECT_LOCK_TTL_MS,
+    REDIRECT_LOCK_POLL_INTERVAL,
+    EARLY_REFRESH_BETA,
+    L1_CACHE_TTL,
+)
+from src.cache import acquire_lock, release_lock
+from src.metrics import REDIS_HIT, REDIS_NEGATIVE_HIT, REDIS_MISS, DB_FOUND, DB_NOT_FOUND, DB_EXPIRED
+from src.url.models import Link
+from src.url.redirect_cache import redirect_cache, redirect_key, cache_marker, NOT_FOUND, EXPIRED, NEGATIVE_MARKERS
+from src.url.singleflight import SingleFlight, should_refresh_early
+
+# Промах кэша редиректа: в воркере один запрос в базу на код (SingleFlight),
+# между воркерами - блокировка в Redis с короткой арендой, остальные ждут значения в кэше.
+redirect_flight = SingleFlight()
+# скользящая оценка времени загрузки ссылки из базы, нужна для раннего обновления
+lookup_time = 0.005
+
+
+def lock_key(short_code: str) -> str:
+    return f"lock:{redirect_key(short_code)}"
+
+
+async def get_cached_redirect(redis, short_code: str) -> Tuple[Optional[bytes], float]:
+    pipe = redis.pipeline(transaction=False)
+    pipe.get(redirect_key(short_code))
+    pipe.pttl(redirect_key(short_code))
+    value, ttl_ms = await pipe.execute()
+    return value, ttl_ms / 1000 if ttl_ms and ttl_ms > 0 else 0.0
+
+
+def l1_ttl(ttl_left: float) -> Optional[float]:
+    """Срок в L1 для значения из Redis: не дольше, чем ему осталось жить там. 0 - ключ без срока."""
+    return min(L1_CACHE_TTL, ttl_left) if ttl_left else None
+
+
+async def lookup_link(db: AsyncSession, redis, short_code: str) -> bytes:
+    global lookup_time
+    started = time.perf_counter()
+
+    # без фильтра по is_active: между коммитом чистильщика и его меткой EXPIRED
+    # деактивированная ссылка должна отвечать 410, а не 404
+    result = await db.execute(select(Link).where(Link.short_code == short_code))
+    link = result.scalars().first()
+
+    if not link:
+        DB_NOT_FOUND.inc()
+        await cache_marker(redis, short_code, NOT_FOUND, NEGATIVE_CACHE_TTL)
+        return NOT_FOUND
+
+    now = datetime.datetime.utcnow()
+    if not link.is_active or (link.expires_at and now > link.expires_at):
+        DB_EXPIRED.inc()
+        if link.is_active:
+            link.is_active = False
+            await db.commit()
+        await cache_marker(redis, short_code, EXPIRED, EXPIRED_CACHE_TTL)
+        return EXPIRED
+
+    DB_FOUND.inc()
+    cache_ttl = REDIRECT_CACHE_TTL
+    if link.expires_at:
+        # не отдаём из кэша ссылку, которая уже истекла
+        cache_ttl = max(1, min(cache_ttl, int((link.expires_at - now).total_seconds())))
+    url = link.original_url.encode("utf-8")
+    await redis.set(redirect_key(short_code), url, ex=cache_ttl)
+    # L1 не должен пережить ссылку, иначе после истечения она ещё до минуты отвечает 307
+    redirect_cache.set(short_code, url, ttl=min(L1_CACHE_TTL, cache_ttl))
+
+    lookup_time = 0.9 * lookup_time + 0.1 * (time.perf_counter() - started)
+    return url
+
+
+async def load_link(db: AsyncSession, redis, short_code: str) -> bytes:
+    token = await acquire_lock(redis, lock_key(short_code), REDIRECT_LOCK_TTL_MS)
+    if token is None:
+        # ссылку уже грузит другой воркер, ждём пока он положит её в кэш
+        deadline = time.monotonic() + REDIRECT_LOCK_TTL_MS / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(REDIRECT_LOCK_POLL_INTERVAL)
+            cached, ttl_left = await get_cached_redirect(redis, short_code)
+            if cached:
+                redirect_cache.set(short_code, cached, ttl=l1_ttl(ttl_left))
+                return cached
+        # аренда истекла, а значения нет - грузим сами
+    try:
+        return await lookup_link(db, redis, short_code)
+    finally:
+        if token is not None:
+            await release_lock(redis, lock_key(short_code), token)
+
+
+async def refresh_link(session_factory, redis, short_code: str):
+    token = await acquire_lock(redis, lock_key(short_code), REDIRECT_LOCK_TTL_MS)
+    if token is None:
+        return
+    try:
+        # своя сессия: фоновая задача идёт после ответа, сессия запроса из get_db к этому времени закрыта
+        async with session_factory() as db:
+            await redirect_flight.do(short_code, lambda: lookup_link(db, redis, short_code))
+    finally:
+        await release_lock(redis, lock_key(short_code), token)
+
+
+async def resolve_redirect(db: AsyncSession, redis, short_code: str, background_tasks: BackgroundTasks,
+                           session_factory) -> bytes:
+    """Возвращает url (bytes) или одну из меток NOT_FOUND/EXPIRED/DELETED.
+
+    session_factory - для раннего обновления в фоне, после ответа.
+    """
+    cached = redirect_cache.get(short_code)
+    if cached is not None:
+        return cached
+
+    cached, ttl_left = await get_cached_redirect(redis, short_code)
+    if cached:
+        (REDIS_NEGATIVE_HIT if cached in NEGATIVE_MARKERS else REDIS_HIT).inc()
+        redirect_cache.set(short_code, cached, ttl=l1_ttl(ttl_left))
+        if cached not in NEGATIVE_MARKERS and should_refresh_early(ttl_left, lookup_time, EARLY_REFRESH_BETA):
+            background_tasks.add_task(refresh_link, session_factory, redis, short_code)
+        return cached
+    REDIS_MISS.inc()
+
+    return await redirect_flight.do(short_code, lambda: load_link(db, redis, short_code))
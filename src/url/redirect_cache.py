@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from src.config import L1_CACHE_MAX_BYTES, L1_CACHE_TTL, NEGATIVE_CACHE_TTL
+from src.cache import get_redis
+from src.metrics import L1_HIT, L1_NEGATIVE_HIT, L1_MISS, L1_EXPIRED
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "links:invalidate"
+
+# Схема ключей: short:{code} всегда строка. Либо url, либо одна из меток ниже,
+# которые не могут быть url (начинаются с нулевого байта).
+NOT_FOUND = b"\x00404"
+EXPIRED = b"\x00410"
+DELETED = b"\x00del"
+NEGATIVE_MARKERS = (NOT_FOUND, EXPIRED, DELETED)
+
+
+def redirect_key(short_code: str) -> str:
+    return f"short:{short_code}"
+
+# tuple(expires_at, url) + узел OrderedDict, примерно
+ENTRY_OVERHEAD = 120
+
+
+class RedirectCache:
+    """LRU-кэш short_code -> url (bytes) в памяти воркера с TTL и ограничением по байтам."""
+
+    def __init__(self, max_bytes: int = L1_CACHE_MAX_BYTES, ttl: float = L1_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _entry_size(short_code: str, url: bytes) -> int:
+        return sys.getsizeof(short_code) + sys.getsizeof(url) + ENTRY_OVERHEAD
+
+    def get(self, short_code: str, record_miss: bool = True) -> Optional[bytes]:
+        """record_miss=False - промах ничего не считает и не трогает запись: его учтёт следующий get."""
+        entry = self._entries.get(short_code)
+        if entry is None:
+            if record_miss:
+                self.misses += 1
+                L1_MISS.inc()
+            return None
+        expires_at, url = entry
+        if expires_at < time.monotonic():
+            if not record_miss:
+                return None
+            self._remove(short_code)
+            self.expirations += 1
+            self.misses += 1
+            L1_EXPIRED.inc()
+            return None
+        self._entries.move_to_end(short_code)
+        self.hits += 1
+        (L1_NEGATIVE_HIT if url in NEGATIVE_MARKERS else L1_HIT).inc()
+        return url
+
+    def set(self, short_code: str, url: bytes, ttl: Optional[float] = None):
+        size = self._entry_size(short_code, url)
+        if size > self.max_bytes:
+            return
+        if ttl is None:
+            # метка 404 живёт недолго, иначе созданная ссылка будет 404 до истечения L1
+            ttl = min(self.ttl, NEGATIVE_CACHE_TTL) if url == NOT_FOUND else self.ttl
+        self._remove(short_code)
+        self._entries[short_code] = (time.monotonic() + ttl, url)
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            oldest, _ = next(iter(self._entries.items()))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, short_code: str):
+        if self._remove(short_code):
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def _remove(self, short_code: str) -> bool:
+        entry = self._entries.pop(short_code, None)
+        if entry is None:
+            return False
+        self.size_bytes -= self._entry_size(short_code, entry[1])
+        return True
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+redirect_cache = RedirectCache()
+
+
+async def publish_invalidation(redis, short_code: str):
+    redirect_cache.invalidate(short_code)
+    await redis.publish(INVALIDATION_CHANNEL, short_code)
+
+
+async def evict_link(redis, short_code: str):
+    await redis.delete(redirect_key(short_code))
+    await publish_invalidation(redis, short_code)
+
+
+async def evict_links(redis, short_codes: List[str]):
+    if not short_codes:
+        return
+    pipe = redis.pipeline(transaction=False)
+    pipe.delete(*(redirect_key(code) for code in short_codes))
+    for code in short_codes:
+        redirect_cache.invalidate(code)
+        pipe.publish(INVALIDATION_CHANNEL, code)
+    await pipe.execute()
+
+
+async def cache_marker(redis, short_code: str, marker: bytes, ttl: int):
+    await redis.set(redirect_key(short_code), marker, ex=ttl)
+    redirect_cache.set(short_code, marker)
+
+
+async def cache_markers(redis, short_codes: List[str], marker: bytes, ttl: int):
+    if not short_codes:
+        return
+    pipe = redis.pipeline(transaction=False)
+    for code in short_codes:
+        pipe.set(redirect_key(code), marker, ex=ttl)
+        # другие воркеры сбросят url из L1 и прочитают метку из Redis
+        pipe.publish(INVALIDATION_CHANNEL, code)
+        redirect_cache.set(code, marker)
+    await pipe.execute()
+
+
+async def listen_invalidations(ready: Optional[asyncio.Event] = None):
+    """ready выставляется после первой подписки: с этого момента L1 больше не сбрасывается целиком."""
+    while True:
+        try:
+            pubsub = (await get_redis()).pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # пока не были подписаны, могли пропустить инвалидации
+            redirect_cache.clear()
+            if ready is not None:
+                ready.set()
+            try:
+                while True:
+                    # явный timeout, иначе чтение упрётся в REDIS_SOCKET_TIMEOUT пула
+                    message = await pubsub.get_message(timeout=1.0)
+                    # отмена, совпавшая с таймаутом чтения, превращается внутри redis-py в обычный таймаут;
+                    # задача остаётся в состоянии cancelling, и следующие таймауты в ней уже не срабатывают
+                    if asyncio.current_task().cancelling():
+                        raise asyncio.CancelledError
+                    if message:
+                        redirect_cache.invalidate(message["data"].decode("utf-8"))
+            finally:
+                await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Invalidation listener error: {str(e)}")
+            await asyncio.sleep(1)
@@ -30,6 +30,9 @@ class LinkStats(BaseModel):
     created_at: datetime
     last_used_at: Optional[datetime] = None
     clicks: int
+    # оценка HyperLogLog (ошибка около 0.8%), заполняется только в /links/{short_code}/stats
+    unique_visitors: Optional[int] = None
+    unique_visitors_window: Optional[int] = None # за последние days дней
     expires_at: datetime
 
     class Config:
@@ -37,6 +40,18 @@ class LinkStats(BaseModel):
         arbitrary_types_allowed = True
 
 
+class ClickPoint(BaseModel):
+    time: datetime
+    clicks: int
+
+class ClickSeries(BaseModel):
+    short_code: str
+    interval: str
+    start: datetime
+    end: datetime
+    points: List[ClickPoint]
+
+
 class LinkSearchResult(BaseModel):
     short_code: str
     original_url: str
@@ -50,3 +65,14 @@ class ExpLinkResponse(BaseModel):
     message: Optional[str] = None
     data: Optional[List[LinkStats]] = None
 
+class LinkBatchItemResult(BaseModel):
+    index: int
+    short_url: Optional[str] = None
+    original_url: Optional[str] = None
+    error: Optional[str] = None
+
+class LinkBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[LinkBatchItemResult]
+
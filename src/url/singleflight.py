@@ -0,0 +1,50 @@
+import asyncio
+import math
+import random
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Склеивает одновременные вызовы с одним ключом: работу делает первый, остальные ждут его результат."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            await asyncio.wait({future})
+            if not future.cancelled():
+                return future.result()
+            # ведущий запрос отменили (клиент ушёл), пробуем сами
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # ждущих может не быть, не пишем "exception was never retrieved"
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def __len__(self):
+        return len(self._inflight)
+
+
+def should_refresh_early(ttl_left: float, delta: float, beta: float) -> bool:
+    """Вероятностное раннее обновление (XFetch): чем ближе истечение и дороже пересчёт, тем вероятнее."""
+    if ttl_left <= 0 or beta <= 0:
+        return False
+    return -delta * beta * math.log(1.0 - random.random()) >= ttl_left
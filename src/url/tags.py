@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import String, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import TAG_CACHE_SIZE, TAG_CACHE_TTL
+from src.url.models import Tag
+
+
+class TagCache:
+    """LRU lower(name) -> id. Кладём только закоммиченные теги, TTL страхует от ручного удаления тегов.
+
+    Ключ - lower() из базы: ищем по name.lower() из Python, при расхождении с базой это просто промах.
+    """
+
+    def __init__(self, max_size: int = TAG_CACHE_SIZE, ttl: float = TAG_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str) -> Optional[int]:
+        entry = self._entries.get(name)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[name]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(name)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, name: str, tag_id: int):
+        self._entries[name] = (time.monotonic() + self.ttl, tag_id)
+        self._entries.move_to_end(name)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+tag_cache = TagCache()
+
+
+async def get_tag_by_name(db: AsyncSession, tag_name: str) -> Optional[Tag]:
+    result = await db.execute(select(Tag).where(func.lower(Tag.name) == func.lower(tag_name)))
+    return result.scalars().first()
+
+
+async def _select_tag_ids(db: AsyncSession, names: List[str]) -> Dict[str, int]:
+    # сравнение и ключ кэша - lower() базы: str.lower() для части символов (İ и др.) даёт другое
+    wanted = func.unnest(bindparam("names", names, type_=ARRAY(String))).table_valued("name").render_derived()
+    result = await db.execute(
+        select(wanted.c.name, func.lower(Tag.name), Tag.id)
+        .join(Tag, func.lower(Tag.name) == func.lower(wanted.c.name))
+    )
+    tag_ids = {}
+    for name, key, tag_id in result.all():
+        tag_ids[name] = tag_id
+        if name.lower() == key:
+            tag_cache.set(key, tag_id)
+    return tag_ids
+
+
+async def _upsert_tags(db: AsyncSession, names: List[str]) -> Dict[str, int]:
+    # ON CONFLICT по уникальному индексу ix_tags_name_lower, без commit/IntegrityError/перезапроса
+    result = await db.execute(
+        pg_insert(Tag)
+        .values([{"name": name} for name in names])
+        .on_conflict_do_nothing(index_elements=[func.lower(Tag.name)])
+        .returning(Tag.name, Tag.id)
+    )
+    # в кэш не кладём: тег появится в базе только после commit вызывающего
+    return dict(result.all())
+
+
+async def resolve_tags(db: AsyncSession, tag_names: List[str]) -> Dict[str, int]:
+    """name -> id для переданных имён. Один SELECT по промахам кэша и один upsert для новых тегов."""
+    tag_ids: Dict[str, int] = {}
+    for name in tag_names:
+        tag_id = tag_cache.get(name.lower())
+        if tag_id is not None:
+            tag_ids[name] = tag_id
+
+    unknown = list(dict.fromkeys(name for name in tag_names if name not in tag_ids))
+    if unknown:
+        tag_ids.update(await _select_tag_ids(db, unknown))
+
+    missing = [name for name in unknown if name not in tag_ids]
+    if missing:
+        tag_ids.update(await _upsert_tags(db, missing))
+        # тег мог успеть создать параллельный запрос или другое имя из этого же списка
+        raced = [name for name in missing if name not in tag_ids]
+        if raced:
+            tag_ids.update(await _select_tag_ids(db, raced))
+    return tag_ids
+
+
+async def resolve_tag(db: AsyncSession, tag_name: str) -> int:
+    return (await resolve_tags(db, [tag_name]))[tag_name]
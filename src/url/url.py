@@ -1,69 +1,117 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, status, Query
-from fastapi.responses import RedirectResponse
-import datetime, secrets, re
-from redis import asyncio as aioredis
-from sqlalchemy import func
-from typing import Optional
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Response, status, Query
+from fastapi.responses import RedirectResponse, StreamingResponse
+import datetime, re
+from sqlalchemy import func, select, bindparam, String, Integer, DateTime
+from typing import Optional, List, Dict, Set
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
 import urllib.parse
 
-from src.config import REDIS_URL
-from src.config import TTL_LINK
-from src.database import get_db
-from src.url.models import Link, Tag
-from src.url.schemas import LinkCreate, LinkUpdate, LinkStats, LinkSearchResult, ExpLinkResponse
+from src.config import (
+    TTL_LINK,
+    TOMBSTONE_TTL,
+    BATCH_SHORTEN_MAX_ITEMS,
+    SEARCH_PAGE_SIZE,
+    SEARCH_MAX_PAGE_SIZE,
+    SEARCH_STREAM_CHUNK_SIZE,
+    LINKS_PAGE_SIZE,
+    LINKS_MAX_PAGE_SIZE,
+    CLICK_SERIES_MAX_POINTS,
+    VISITORS_DAILY_DAYS,
+)
+from src.database import get_db, get_session_factory
+from src.cache import get_redis
+from src.url.models import Link, LinkVisitors, Tag, extract_host
+from src.url.clicks import record_click, get_pending_clicks
+from src.url.click_stream import BUCKETS, DEFAULT_RANGE, to_utc, truncate, click_series
+from src.url.visitors import visitor_key, count_visitors, reset_visitors
+from src.url.codes import code_allocator
+from src.url.tags import resolve_tag, resolve_tags
+from src.url.redirect_cache import (
+    redirect_cache,
+    redirect_key,
+    publish_invalidation,
+    evict_link,
+    evict_links,
+    NOT_FOUND,
+    EXPIRED,
+    DELETED,
+)
+from src.url.redirect import resolve_redirect
+from src.url.partitions import SKIP_CODE_CONFLICTS
+from src.url.pagination import keyset, next_cursor
+from src.url.schemas import (
+    LinkCreate,
+    LinkUpdate,
+    LinkStats,
+    ClickSeries,
+    ClickPoint,
+    LinkSearchResult,
+    ExpLinkResponse,
+    LinkBatchItemResult,
+    LinkBatchResponse,
+)
 from src.auth.auth import get_current_user
 
 router = APIRouter()
 
-redis_client = aioredis.from_url(REDIS_URL)
-
 BASE_SHORT_URL = "https://url.short/" #Написал по приколу, чтобы у юзера отображалось как bit.ly в /shorten и обновлении ссылки
 
-def generate_short_code(length: int = 8) -> str:
-    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
-
-async def get_redis():
-    redis = await aioredis.from_url(REDIS_URL)
-    try:
-        yield redis
-    finally:
-        await redis.close()
+CODE_ALLOCATION_ATTEMPTS = 5
+
+def get_owner_id(current_user: dict) -> Optional[int]:
+    sub = current_user.get("sub")
+    return None if sub in (None, "anonymous") else int(sub)
+
+async def insert_links(db: AsyncSession, rows: List[dict]) -> Set[str]:
+    """Вставляет все строки одним INSERT ... SELECT FROM unnest(...), возвращает вставленные коды.
+
+    Коды, которые уже заняты, пропускаются (ON CONFLICT DO NOTHING, а в секционированной
+    links - триггер уникальности short_code, см. src/url/partitions.py).
+    """
+    if not rows:
+        return set()
+    source = func.unnest(
+        bindparam("original_url", [row["original_url"] for row in rows], type_=ARRAY(String)),
+        bindparam("short_code", [row["short_code"] for row in rows], type_=ARRAY(String)),
+        bindparam("expires_at", [row["expires_at"] for row in rows], type_=ARRAY(DateTime)),
+        bindparam("owner_id", [row["owner_id"] for row in rows], type_=ARRAY(Integer)),
+        bindparam("tag_id", [row["tag_id"] for row in rows], type_=ARRAY(Integer)),
+        bindparam("host", [extract_host(row["original_url"]) for row in rows], type_=ARRAY(String)),
+    ).table_valued("original_url", "short_code", "expires_at", "owner_id", "tag_id", "host").render_derived()
+
+    await db.execute(select(func.set_config(SKIP_CODE_CONFLICTS, "on", True)))
+    result = await db.execute(
+        pg_insert(Link)
+        .from_select(
+            ["original_url", "short_code", "expires_at", "owner_id", "tag_id", "host"],
+            select(
+                source.c.original_url,
+                source.c.short_code,
+                source.c.expires_at,
+                source.c.owner_id,
+                source.c.tag_id,
+                source.c.host,
+            ),
+        )
+        .on_conflict_do_nothing()
+        .returning(Link.short_code)
+    )
+    created = set(result.scalars().all())
+    await db.execute(select(func.set_config(SKIP_CODE_CONFLICTS, "off", True)))
+    return created
 
 @router.post("/links/shorten", status_code=status.HTTP_201_CREATED)
 async def create_short_link(
                             link_data: LinkCreate,
                             background_tasks: BackgroundTasks,
                             request: Request,
-                            db: Session = Depends(get_db),
+                            db: AsyncSession = Depends(get_db),
                             current_user: dict = Depends(get_current_user),
                             redis=Depends(get_redis)
                             ):
-    tag_id = None
-
-    if link_data.tag_name:
-        tag_name = link_data.tag_name.strip()
-
-        tag = db.query(Tag).filter(
-            func.lower(Tag.name) == func.lower(tag_name)
-        ).first()
-
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.add(tag)
-            try:
-                db.commit()
-                db.refresh(tag)
-            except IntegrityError:
-                db.rollback()
-                tag = db.query(Tag).filter(
-                    func.lower(Tag.name) == func.lower(tag_name)
-                ).first()
-
-        tag_id = tag.id
-
     if link_data.custom_alias:
         short_code = link_data.custom_alias.strip()
 
@@ -79,77 +127,258 @@ async def create_short_link(
                 detail="Длина кода должна быть от 4 до 20 символов"
             )
 
-        if db.query(Link).filter(Link.short_code == short_code).first():
+        if await db.scalar(select(Link.id).where(Link.short_code == short_code)):
             raise HTTPException(
                 status_code=400,
                 detail="Ошибка, попробуйте другой код"
             )
-    else:
-        short_code = generate_short_code()
-        while db.query(Link).filter(Link.short_code == short_code).first():
-            short_code = generate_short_code()
-
     expires_at = datetime.datetime.utcnow() + datetime.timedelta(days=TTL_LINK)
 
-    owner_id = None if current_user.get("sub") == "anonymous" else current_user.get("sub")
+    owner_id = get_owner_id(current_user)
 
-    new_link = Link(
-        original_url=urllib.parse.unquote(link_data.original_url),
-        short_code=short_code,
-        expires_at=expires_at,
-        owner_id=owner_id,
-        tag_id=tag_id
-    )
-    db.add(new_link)
-    try:
-        db.commit()
-    except IntegrityError:
-        db.rollback()
-        raise HTTPException(
-            status_code=400,
-            detail="Произошла ошибка при создании ссылки. Возможно такой код уже существует"
+    for attempt in range(CODE_ALLOCATION_ATTEMPTS):
+        tag_id = None
+        if link_data.tag_name and link_data.tag_name.strip():
+            # внутри цикла: rollback после конфликта кода откатывает и только что созданный тег
+            tag_id = await resolve_tag(db, link_data.tag_name.strip())
+
+        if not link_data.custom_alias:
+            short_code = await code_allocator.allocate(db)
+
+        new_link = Link(
+            original_url=urllib.parse.unquote(link_data.original_url),
+            short_code=short_code,
+            expires_at=expires_at,
+            owner_id=owner_id,
+            tag_id=tag_id
         )
+        db.add(new_link)
+        try:
+            await db.commit()
+            break
+        except IntegrityError:
+            await db.rollback()
+            # сгенерированный код мог совпасть только с чьим-то кастомным алиасом, берём следующий
+            if link_data.custom_alias or attempt == CODE_ALLOCATION_ATTEMPTS - 1:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Произошла ошибка при создании ссылки. Возможно такой код уже существует"
+                )
+
+    # под этим кодом могли лежать метка 404 или надгробие удалённой ссылки
+    await evict_link(redis, short_code)
+    await reset_visitors(redis, [short_code])
 
     return {"short_url": BASE_SHORT_URL + new_link.short_code,
             "original_url": new_link.original_url}
 
+@router.post("/links/shorten/batch", response_model=LinkBatchResponse)
+async def create_short_links_batch(
+                                   links_data: List[LinkCreate],
+                                   db: AsyncSession = Depends(get_db),
+                                   current_user: dict = Depends(get_current_user),
+                                   redis=Depends(get_redis)
+                                   ):
+    if len(links_data) > BATCH_SHORTEN_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком много ссылок в одном запросе, максимум {BATCH_SHORTEN_MAX_ITEMS}"
+        )
+
+    results: List[Optional[LinkBatchItemResult]] = [None] * len(links_data)
+    tag_ids = await resolve_tags(db, [
+        item.tag_name.strip() for item in links_data if item.tag_name and item.tag_name.strip()
+    ])
+
+    codes: Dict[int, str] = {}
+    aliases: Set[str] = set()
+    pending: List[int] = []
+    for index, item in enumerate(links_data):
+        if item.custom_alias:
+            alias = item.custom_alias.strip()
+            if alias in aliases:
+                results[index] = LinkBatchItemResult(index=index, error="Код повторяется в запросе")
+                continue
+            aliases.add(alias)
+            codes[index] = alias
+        pending.append(index)
+
+    expires_at = datetime.datetime.utcnow() + datetime.timedelta(days=TTL_LINK)
+    owner_id = get_owner_id(current_user)
+
+    for _ in range(CODE_ALLOCATION_ATTEMPTS):
+        generated = [index for index in pending if not links_data[index].custom_alias]
+        codes.update(zip(generated, await code_allocator.allocate_many(db, len(generated))))
+
+        inserted = await insert_links(db, [
+            {
+                "original_url": urllib.parse.unquote(links_data[index].original_url),
+                "short_code": codes[index],
+                "expires_at": expires_at,
+                "owner_id": owner_id,
+                "tag_id": tag_ids.get((links_data[index].tag_name or "").strip()),
+            }
+            for index in pending
+        ])
+
+        retry = []
+        for index in pending:
+            if codes[index] in inserted:
+                results[index] = LinkBatchItemResult(
+                    index=index,
+                    short_url=BASE_SHORT_URL + codes[index],
+                    original_url=urllib.parse.unquote(links_data[index].original_url)
+                )
+            elif links_data[index].custom_alias:
+                results[index] = LinkBatchItemResult(index=index, error="Ошибка, попробуйте другой код")
+            else:
+                # сгенерированный код совпал с чьим-то алиасом, берём следующий
+                retry.append(index)
+        pending = retry
+        if not pending:
+            break
+
+    for index in pending:
+        results[index] = LinkBatchItemResult(index=index, error="Не удалось подобрать свободный код")
+
+    await db.commit()
+    created = [codes[result.index] for result in results if result.error is None]
+    await evict_links(redis, created)
+    await reset_visitors(redis, created)
+
+    return LinkBatchResponse(created=len(created), failed=len(results) - len(created), results=results)
+
+async def stream_search_results(session_factory, query):
+    # серверный курсор: в памяти не больше SEARCH_STREAM_CHUNK_SIZE строк, сколько бы ссылок ни нашлось
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=SEARCH_STREAM_CHUNK_SIZE))
+        async for rows in result.partitions():
+            yield "".join(
+                LinkSearchResult(
+                                 original_url=row.original_url,
+                                 short_code=row.short_code,
+                                 tag_name=row.tag_name
+                ).model_dump_json() + "\n" for row in rows
+            )
+
 @router.get("/links/search", response_model=list[LinkSearchResult])
 async def search_links(
+                       response: Response,
                        original_url: Optional[str] = Query(default=""),
                        tag_name: Optional[str] = Query(None),
-                       db: Session = Depends(get_db)
+                       host: Optional[str] = Query(None, description="Точный домен ссылки, например example.com"),
+                       cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущего ответа"),
+                       limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+                       stream: bool = Query(False, description="Отдать все совпадения после курсора в NDJSON, limit не действует"),
+                       db: AsyncSession = Depends(get_db),
+                       session_factory: async_sessionmaker = Depends(get_session_factory)
                       ):
-    query = db.query(Link).options(joinedload(Link.tag))
+    query = select(
+                   Link.id,
+                   Link.created_at,
+                   Link.original_url,
+                   Link.short_code,
+                   Tag.name.label("tag_name")
+                  ).outerjoin(Tag, Link.tag_id == Tag.id)
 
     if tag_name:
         tag_name_clean = tag_name.strip().lower()
-        query = query.join(Tag).filter(func.lower(Tag.name) == tag_name_clean)
+        query = query.where(func.lower(Tag.name) == tag_name_clean)
 
 
+    if host:
+        query = query.where(Link.host == host.strip().lower())
+
     if original_url:
         search_clean = urllib.parse.unquote(original_url).strip().lower()
-        query = query.filter(func.lower(Link.original_url).ilike(f"%{search_clean}%"))
+        # LIKE по lower(original_url) идёт по триграммному индексу ix_links_original_url_trgm
+        search_escaped = search_clean.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.where(func.lower(Link.original_url).like(f"%{search_escaped}%", escape="\\"))
 
 
-    links = query.order_by(Link.created_at.desc()).all()
+    query = keyset(query, cursor)
 
-    if not links:
+    if stream:
+        return StreamingResponse(stream_search_results(session_factory, query), media_type="application/x-ndjson")
+
+    # строка сверх limit только показывает, что есть следующая страница
+    result = await db.execute(query.limit(limit + 1))
+    links = result.all()
+
+    if not links and not cursor:
         raise HTTPException(
                             status_code=404,
                             detail="Ссылки не найдены"
                             )
 
+    links, cursor = next_cursor(links, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+
     return [
         LinkSearchResult(
                          original_url=link.original_url,
                          short_code=link.short_code,
-                         tag_name=link.tag.name if link.tag else None
+                         tag_name=link.tag_name
         ) for link in links
     ]
 
+async def get_owner_links(db: AsyncSession, owner_id: int, active: bool, cursor: Optional[str], limit: int):
+    # (owner_id, is_active) + сортировка по expires_at DESC, id DESC целиком покрываются
+    # ix_links_owner_active_expires: страница читается с нужного места индекса без сортировки
+    query = select(
+                   Link.id,
+                   Link.short_code,
+                   Link.original_url,
+                   Tag.name.label("tag_name"),
+                   Link.created_at,
+                   Link.last_used_at,
+                   Link.clicks,
+                   Link.expires_at
+                  ).outerjoin(Tag, Link.tag_id == Tag.id).where(
+                                                                Link.owner_id == owner_id,
+                                                                Link.is_active == active
+                                                               )
+    result = await db.execute(keyset(query, cursor, sort_column=Link.expires_at).limit(limit + 1))
+    links, cursor = next_cursor(result.all(), limit, sort_key="expires_at")
+    return [
+        LinkStats(
+            short_code=link.short_code,
+            original_url=link.original_url,
+            tag_name=link.tag_name,
+            created_at=link.created_at,
+            last_used_at=link.last_used_at,
+            clicks=link.clicks,
+            expires_at=link.expires_at
+        ) for link in links
+    ], cursor
+
+@router.get("/links/my", response_model=list[LinkStats])
+async def get_my_links(
+                       response: Response,
+                       expired: bool = Query(False, description="true - недействительные ссылки, false - активные"),
+                       cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущего ответа"),
+                       limit: int = Query(LINKS_PAGE_SIZE, ge=1, le=LINKS_MAX_PAGE_SIZE),
+                       db: AsyncSession = Depends(get_db),
+                       current_user: dict = Depends(get_current_user)
+                      ):
+    owner_id = get_owner_id(current_user)
+    if owner_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Требуется аутентификация"
+        )
+    links, cursor = await get_owner_links(db, owner_id, not expired, cursor, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return links
+
 @router.get("/links/exp_links", response_model=ExpLinkResponse)
 async def get_exp_links(
-                        db: Session = Depends(get_db),
+                        response: Response,
+                        cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущего ответа"),
+                        limit: int = Query(LINKS_PAGE_SIZE, ge=1, le=LINKS_MAX_PAGE_SIZE),
+                        db: AsyncSession = Depends(get_db),
                         current_user: dict = Depends(get_current_user)
                        ):
     user_id = current_user.get("sub")
@@ -158,63 +387,40 @@ async def get_exp_links(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Требуется аутентификация"
         )
-    links = db.query(Link) \
-        .options(joinedload(Link.tag)) \
-        .filter(
-                Link.owner_id == user_id,
-                Link.is_active == False
-               ) \
-        .order_by(Link.expires_at.desc()) \
-        .all()
+    links, cursor = await get_owner_links(db, get_owner_id(current_user), False, cursor, limit)
 
     if not links:
         return {"message": "Нет недействительных ссылок"}
 
-    return {
-        "data": [
-        LinkStats(
-            short_code=link.short_code,
-            original_url=link.original_url,
-            tag_name=link.tag.name if link.tag else None,
-            created_at=link.created_at,
-            last_used_at=link.last_used_at,
-            clicks=link.clicks,
-            expires_at=link.expires_at
-        ) for link in links
-    ]}
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return {"data": links}
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return redirect_cache.stats()
 
 @router.get("/links/{short_code}")
 async def redirect_link(
                         short_code: str,
+                        request: Request,
                         background_tasks: BackgroundTasks,
-                        db: Session = Depends(get_db),
-                        redis=Depends(get_redis)
+                        db: AsyncSession = Depends(get_db),
+                        redis=Depends(get_redis),
+                        session_factory: async_sessionmaker = Depends(get_session_factory)
                         ):
-    cached_url = await redis.get(f"short:{short_code}")
-    if cached_url:
-        return RedirectResponse(url=cached_url.decode("utf-8"))
-
-    link = db.query(Link).filter(
-                                 Link.short_code == short_code,
-                                 Link.is_active == True
-                                ).first()
+    target = await resolve_redirect(db, redis, short_code, background_tasks, session_factory)
 
-    if not link:
+    if target in (NOT_FOUND, DELETED):
         raise HTTPException(status_code=404, detail="Ссылка не найдена")
-
-    if link.expires_at and datetime.datetime.utcnow() > link.expires_at:
-        link.is_active = False
-        db.commit()
+    if target == EXPIRED:
         raise HTTPException(status_code=410, detail="Ссылка истекла")
 
-    link.clicks += 1
-    link.last_used_at = datetime.datetime.utcnow()
-    db.commit()
-
-    await redis.set(f"short:{short_code}", link.original_url, ex=300)
+    visitor = visitor_key(request.client.host if request.client else "", request.headers.get("user-agent", ""))
+    background_tasks.add_task(record_click, redis, short_code, visitor)
 
     return RedirectResponse(
-                            url=link.original_url,
+                            url=target.decode("utf-8"),
                             status_code=status.HTTP_307_TEMPORARY_REDIRECT
                             )
 
@@ -222,13 +428,14 @@ async def redirect_link(
 async def update_link(
                       short_code: str,
                       link_update: LinkUpdate,
-                      db: Session = Depends(get_db),
+                      db: AsyncSession = Depends(get_db),
                       current_user: dict = Depends(get_current_user),
                       redis=Depends(get_redis)
                       ):
 
-    link = db.query(Link).filter(Link.short_code == short_code,
-                                 Link.owner_id == current_user.get("sub")).first()
+    result = await db.execute(select(Link).where(Link.short_code == short_code,
+                                                 Link.owner_id == get_owner_id(current_user)))
+    link = result.scalars().first()
 
     if not link:
         raise HTTPException(status_code=404, detail="Ссылка не найдена или доступ запрещён")
@@ -241,25 +448,14 @@ async def update_link(
         if link_update.tag_name.strip() == "":
             new_tag_id = None
         else:
-            tag_name = link_update.tag_name.strip()
-            tag = db.query(Tag).filter(
-                func.lower(Tag.name) == func.lower(tag_name)
-            ).first()
-
-            if not tag:
-                tag = Tag(name=tag_name)
-                db.add(tag)
-                db.commit()
-                db.refresh(tag)
-
-            new_tag_id = tag.id
+            new_tag_id = await resolve_tag(db, link_update.tag_name.strip())
         link.tag_id = new_tag_id
 
     link.expires_at = datetime.datetime.utcnow() + datetime.timedelta(days=TTL_LINK)
 
-    db.commit()
+    await db.commit()
 
-    await redis.delete(f"short:{short_code}")
+    await evict_link(redis, short_code)
 
     return {
             "message": "Ссылка обновлена",
@@ -272,7 +468,7 @@ async def update_link(
 @router.delete("/links/{short_code}")
 async def delete_link(
                       short_code: str,
-                      db: Session = Depends(get_db),
+                      db: AsyncSession = Depends(get_db),
                       current_user: dict = Depends(get_current_user),
                       redis=Depends(get_redis)
                       ):
@@ -280,43 +476,85 @@ async def delete_link(
         raise HTTPException(status_code=401,
                             detail="Требуется аутентификация для удаления ссылки")
 
-    link = db.query(Link).filter(Link.short_code == short_code,
-                                 Link.owner_id == current_user.get("sub")).first()
+    result = await db.execute(select(Link).where(Link.short_code == short_code,
+                                                 Link.owner_id == get_owner_id(current_user)))
+    link = result.scalars().first()
     if not link:
         raise HTTPException(status_code=404, detail="Ссылка не найдена или доступ запрещён")
 
-    tag_name = link.tag.name if link.tag else ""
+    await db.delete(link)
+    await db.commit()
 
-    db.delete(link)
-    db.commit()
-
-    await redis.hset(
-        f"short:{short_code}",
-        mapping={
-            "url": link.original_url,
-            "tag": tag_name
-        }
-    )
+    await redis.set(redirect_key(short_code), DELETED, ex=TOMBSTONE_TTL)
+    await publish_invalidation(redis, short_code)
     return {"message": "Ссылка удалена"}
 
 
 @router.get("/links/{short_code}/stats", response_model=LinkStats)
 async def get_link_stats(
                           short_code: str,
-                          db: Session = Depends(get_db)
+                          days: Optional[int] = Query(None, ge=1, description="Ещё и уникальные посетители за последние days дней (нужны VISITORS_DAILY_DAYS)"),
+                          db: AsyncSession = Depends(get_db),
+                          redis=Depends(get_redis)
                         ):
-    link = db.query(Link).options(joinedload(Link.tag)) \
-           .filter(Link.short_code == short_code) \
-           .first()
+    if days and days > VISITORS_DAILY_DAYS:
+        raise HTTPException(status_code=400, detail=f"Уникальные посетители хранятся по дням не больше {VISITORS_DAILY_DAYS} дней")
 
-    if not link:
+    result = await db.execute(select(Link, LinkVisitors.unique_visitors).options(joinedload(Link.tag))
+                              .outerjoin(LinkVisitors, LinkVisitors.link_id == Link.id)
+                              .where(Link.short_code == short_code))
+    row = result.first()
+
+    if not row:
         raise HTTPException(status_code=404, detail="Ссылка не найдена")
+    link, visitors_snapshot = row
+
+    # клики из буфера ещё не записаны в links, досчитываем их сами
+    pending_clicks, pending_last_used = await get_pending_clicks(redis, short_code)
+    last_used_at = max(filter(None, (link.last_used_at, pending_last_used)), default=None)
+    unique_visitors, unique_visitors_window = await count_visitors(redis, short_code, visitors_snapshot, days)
+
     return LinkStats(
         short_code=link.short_code,
         original_url=link.original_url,
         tag_name=link.tag.name if link.tag else None,
         created_at=link.created_at,
-        last_used_at=link.last_used_at,
-        clicks=link.clicks,
+        last_used_at=last_used_at,
+        clicks=(link.clicks or 0) + pending_clicks,
+        unique_visitors=unique_visitors,
+        unique_visitors_window=unique_visitors_window,
         expires_at=link.expires_at
     )
+
+@router.get("/links/{short_code}/clicks", response_model=ClickSeries)
+async def get_link_clicks(
+                          short_code: str,
+                          start: Optional[datetime.datetime] = Query(None, description="Начало диапазона, по умолчанию сутки (для day - 30 дней) до end"),
+                          end: Optional[datetime.datetime] = Query(None, description="Конец диапазона, не включая; по умолчанию сейчас"),
+                          interval: str = Query("hour", pattern="^(hour|day)$"),
+                          db: AsyncSession = Depends(get_db)
+                         ):
+    link_id = (await db.execute(select(Link.id).where(Link.short_code == short_code))).scalar()
+    if link_id is None:
+        raise HTTPException(status_code=404, detail="Ссылка не найдена")
+
+    # границы выравниваем по интервалам, текущий неполный интервал входит в ответ
+    step = BUCKETS[interval]
+    end_at = to_utc(end) if end else datetime.datetime.utcnow()
+    if truncate(end_at, interval) != end_at:
+        end_at = truncate(end_at, interval) + step
+    start_at = truncate(start, interval) if start else end_at - DEFAULT_RANGE[interval]
+    if start_at >= end_at:
+        raise HTTPException(status_code=400, detail="Начало диапазона должно быть раньше конца")
+    if (end_at - start_at) / step > CLICK_SERIES_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Не больше {CLICK_SERIES_MAX_POINTS} точек, сузьте диапазон или возьмите interval=day")
+
+    # только почасовые счётчики: клики последних CLICK_ROLLUP_INTERVAL секунд ещё в потоке и в ответ не попадают
+    points = await click_series(db, link_id, start_at, end_at, interval)
+    return ClickSeries(
+        short_code=short_code,
+        interval=interval,
+        start=start_at,
+        end=end_at,
+        points=[ClickPoint(time=moment, clicks=clicks) for moment, clicks in points]
+    )
@@ -1,7 +1,8 @@
 import uuid
+from sqlalchemy import event
 from src.auth.utils import hash_password
 from src.auth.models import User
-from src.database import get_db
+from tests.conftest import async_engine
 
 def test_register(client):
         email = f"test_{uuid.uuid4()}@example.com"
@@ -24,15 +25,14 @@ def test_double_register(client):
     assert response.status_code == 400
     assert "уже существует" in response.json()["detail"]
 
-def test_login(client):
+def test_login(client, db):
 
     email = f"test_{uuid.uuid4()}@example.com"
     password = "password"
 
-    with client.app.dependency_overrides[get_db]() as session:
-        user = User(email=email, hashed_password=hash_password(password))
-        session.add(user)
-        session.commit()
+    user = User(email=email, hashed_password=hash_password(password))
+    db.add(user)
+    db.commit()
 
     response = client.post("/auth/login", json={
         "email": email,
@@ -50,6 +50,26 @@ def test_anonymous_access(client):
     response = client.post("/api/links/shorten", json={"original_url": "https://anon.com"})
     assert response.status_code == 201
 
+def test_authentication_needs_no_queries(client):
+    client.post("/auth/register", json={"email": "jwt@test.com", "password": "pass"})
+    token = client.post("/auth/login", json={"email": "jwt@test.com", "password": "pass"}).cookies["access_token"]
+    client.cookies.clear()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        anonymous = client.get("/api/links/my")
+        authorized = client.get("/api/links/my", headers={"Authorization": f"Bearer {token}"})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+
+    assert anonymous.status_code == 401
+    assert authorized.status_code == 200
+    # единственный запрос - сама выборка ссылок пользователя
+    assert len(statements) == 1
+    assert "links" in statements[0]
+
 def test_invalid_email_registration(client):
     response = client.post("/auth/register", json={
         "email": "invalid-email",
@@ -0,0 +1,51 @@
+from src.url.models import Link, Tag
+
+
+def test_batch_shorten(client, db):
+    response = client.post("/api/links/shorten/batch", json=[
+        {"original_url": "https://batch.com/1", "tag_name": "Batch"},
+        {"original_url": "https://batch.com/2", "tag_name": "batch"},
+        {"original_url": "https://batch.com/3", "custom_alias": "batch_alias"},
+        {"original_url": "https://batch.com/4", "tag_name": "test-tag"},
+    ])
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 4
+    assert data["failed"] == 0
+    assert [item["index"] for item in data["results"]] == [0, 1, 2, 3]
+    assert data["results"][2]["short_url"].endswith("/batch_alias")
+
+    assert db.query(Tag).filter(Tag.name.ilike("batch")).count() == 1
+    assert db.query(Link).filter(Link.original_url.like("https://batch.com/%")).count() == 4
+    tagged = db.query(Link).filter(Link.original_url == "https://batch.com/4").first()
+    assert tagged.tag.name == "test-tag"
+
+    short_code = data["results"][0]["short_url"].split("/")[-1]
+    redirect = client.get(f"/api/links/{short_code}", follow_redirects=False)
+    assert redirect.headers["location"] == "https://batch.com/1"
+
+
+def test_batch_alias_conflicts_are_per_item(client):
+    client.post("/api/links/shorten", json={"original_url": "https://a.com", "custom_alias": "takenalias"})
+
+    response = client.post("/api/links/shorten/batch", json=[
+        {"original_url": "https://b.com", "custom_alias": "takenalias"},
+        {"original_url": "https://c.com", "custom_alias": "dupalias"},
+        {"original_url": "https://d.com", "custom_alias": "dupalias"},
+        {"original_url": "https://e.com"},
+    ])
+
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 2
+    assert data["results"][0]["error"]
+    assert data["results"][1]["short_url"].endswith("/dupalias")
+    assert data["results"][2]["error"] == "Код повторяется в запросе"
+    assert data["results"][3]["error"] is None
+
+
+def test_batch_limit(client, mocker):
+    mocker.patch("src.url.url.BATCH_SHORTEN_MAX_ITEMS", 2)
+    response = client.post("/api/links/shorten/batch", json=[{"original_url": "https://x.com"}] * 3)
+    assert response.status_code == 400
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from src.url.models import Link, LinkClicksHourly
+
+
+def add_rollups(db, short_code, *hours):
+    link = db.query(Link).filter(Link.short_code == short_code).first()
+    db.add_all(LinkClicksHourly(link_id=link.id, hour=hour, clicks=clicks) for hour, clicks in hours)
+    db.commit()
+
+
+def test_hourly_series_fills_gaps(client, db):
+    day = datetime(2026, 10, 1)
+    add_rollups(db, "active1", (day + timedelta(hours=1), 5), (day + timedelta(hours=3), 2))
+
+    response = client.get("/api/links/active1/clicks", params={"start": "2026-10-01T00:30:00", "end": "2026-10-01T04:00:00"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["start"] == "2026-10-01T00:00:00"
+    assert data["end"] == "2026-10-01T04:00:00"
+    assert [point["clicks"] for point in data["points"]] == [0, 5, 0, 2]
+
+
+def test_daily_series(client, db):
+    add_rollups(
+        db, "active1",
+        (datetime(2026, 10, 1, 5), 1), (datetime(2026, 10, 1, 23), 4), (datetime(2026, 10, 2, 0), 7),
+    )
+
+    response = client.get("/api/links/active1/clicks", params={"interval": "day", "start": "2026-10-01", "end": "2026-10-03"})
+
+    assert response.status_code == 200
+    assert [(point["time"], point["clicks"]) for point in response.json()["points"]] == [
+        ("2026-10-01T00:00:00", 5),
+        ("2026-10-02T00:00:00", 7),
+    ]
+
+
+def test_default_range_includes_current_hour(client):
+    response = client.get("/api/links/active1/clicks")
+
+    assert response.status_code == 200
+    points = response.json()["points"]
+    assert len(points) == 24
+    assert datetime.fromisoformat(points[-1]["time"]) <= datetime.utcnow()
+
+
+def test_series_validation(client):
+    assert client.get("/api/links/nosuchcode/clicks").status_code == 404
+    assert client.get("/api/links/active1/clicks", params={"interval": "minute"}).status_code == 422
+    assert client.get("/api/links/active1/clicks", params={"start": "2026-10-02", "end": "2026-10-01"}).status_code == 400
+    assert client.get("/api/links/active1/clicks", params={"start": "2020-01-01", "end": "2026-01-01"}).status_code == 400
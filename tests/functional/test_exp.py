@@ -48,4 +48,42 @@ def test_exp_links_empty(client):
 
     response = client.get("/api/links/exp_links")
     assert response.status_code == 200
-    assert response.json()["message"] == "Нет недействительных ссылок"
\ No newline at end of file
+    assert response.json()["message"] == "Нет недействительных ссылок"
+
+
+def test_my_links_pagination(client, db):
+    client.post("/auth/register", json={"email": "owner@test.com", "password": "pass"})
+    client.post("/auth/login", json={"email": "owner@test.com", "password": "pass"})
+    owner = db.query(User).filter(User.email == "owner@test.com").one()
+
+    now = datetime.utcnow()
+    db.add_all(
+        [Link(original_url=f"https://my.com/{i}", short_code=f"my{i}", owner_id=owner.id,
+              expires_at=now + timedelta(days=i), is_active=True) for i in range(5)]
+        + [Link(original_url="https://my.com/old", short_code="myold", owner_id=owner.id,
+                expires_at=now - timedelta(days=1), is_active=False),
+           Link(original_url="https://other.com", short_code="other1", expires_at=now, is_active=True)]
+    )
+    db.commit()
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/api/links/my", params=params)
+        assert response.status_code == 200
+        seen += [item["short_code"] for item in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert seen == ["my4", "my3", "my2", "my1", "my0"]
+
+    response = client.get("/api/links/my", params={"expired": "true"})
+    assert [item["short_code"] for item in response.json()] == ["myold"]
+
+    response = client.get("/api/links/exp_links")
+    assert [item["short_code"] for item in response.json()["data"]] == ["myold"]
+
+
+def test_my_links_requires_auth(client):
+    response = client.get("/api/links/my")
+    assert response.status_code == 401
@@ -0,0 +1,93 @@
+import redis
+from datetime import datetime, timedelta
+from fastapi.responses import RedirectResponse
+from src.main import app
+from src.database import get_db
+from src.url.models import Link
+from src.url.clicks import PENDING_CLICKS_KEY
+from src.url.redirect_cache import redirect_cache
+from tests.conftest import TEST_REDIS_URL, override_get_db
+
+
+def pending_clicks(short_code):
+    client = redis.Redis.from_url(TEST_REDIS_URL)
+    value = client.hget(PENDING_CLICKS_KEY, short_code)
+    client.close()
+    return int(value or 0)
+
+
+def count_sessions():
+    opened = []
+
+    async def counting_get_db():
+        opened.append(1)
+        async for session in override_get_db():
+            yield session
+
+    app.dependency_overrides[get_db] = counting_get_db
+    return opened
+
+
+def test_cached_redirect_skips_session(client):
+    opened = count_sessions()
+
+    slow = client.get("/api/links/active1", follow_redirects=False)
+    fast = client.get("/api/links/active1", follow_redirects=False)
+
+    assert len(opened) == 1
+    assert fast.status_code == slow.status_code == 307
+    assert fast.headers.items() == slow.headers.items()
+    assert pending_clicks("active1") == 2
+
+
+def test_location_is_quoted_like_redirect_response(client):
+    url = "https://example.com/путь?q=a b"
+    redirect_cache.set("unicode1", url.encode("utf-8"))
+    opened = count_sessions()
+
+    response = client.get("/api/links/unicode1", follow_redirects=False)
+
+    # ответил быстрый путь, а не обработчик с базой
+    assert opened == []
+    assert response.status_code == 307
+    assert response.headers["location"] == RedirectResponse(url).headers["location"]
+
+
+def test_cached_errors_match_handler(client, db):
+    db.add(Link(original_url="https://old.com", short_code="oldlink", expires_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.commit()
+    opened = count_sessions()
+
+    for short_code, status_code in (("nosuchcode", 404), ("oldlink", 410)):
+        slow = client.get(f"/api/links/{short_code}", follow_redirects=False)
+        fast = client.get(f"/api/links/{short_code}", follow_redirects=False)
+        assert fast.status_code == slow.status_code == status_code
+        assert fast.content == slow.content
+        assert fast.headers.items() == slow.headers.items()
+
+    assert len(opened) == 2
+
+
+def test_static_routes_are_not_shadowed(client):
+    # код "search" мог попасть в L1 только извне, но роутер всё равно отдал бы /links/search
+    redirect_cache.set("search", b"https://wrong.com")
+    opened = count_sessions()
+
+    response = client.get("/api/links/search", params={"original_url": "active"}, follow_redirects=False)
+
+    assert response.status_code == 200
+    assert {link["short_code"] for link in response.json()} >= {"active1"}
+    # ответил обработчик поиска
+    assert len(opened) == 1
+    # запись в L1 пережила запрос: её не стёр слушатель инвалидаций, проверка что-то проверяла
+    assert redirect_cache.get("search", record_miss=False) == b"https://wrong.com"
+
+
+def test_miss_is_counted_once(client):
+    before = redirect_cache.stats()
+    client.get("/api/links/active1", follow_redirects=False)
+    client.get("/api/links/active1", follow_redirects=False)
+
+    stats = redirect_cache.stats()
+    assert stats["misses"] - before["misses"] == 1
+    assert stats["hits"] - before["hits"] == 1
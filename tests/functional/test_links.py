@@ -88,6 +88,15 @@ def test_duplicate_alias(client):
     assert response.status_code == 400
 
 
+def test_generated_code_skips_taken_alias(client, mocker):
+    client.post("/api/links/shorten", json={"original_url": "https://a.com", "custom_alias": "taken001"})
+    mocker.patch("src.url.url.code_allocator.allocate", side_effect=["taken001", "fresh001"])
+
+    response = client.post("/api/links/shorten", json={"original_url": "https://b.com"})
+    assert response.status_code == 201
+    assert response.json()["short_url"].endswith("/fresh001")
+
+
 def test_click_counter(client):
     create_res = client.post("/api/links/shorten", json={
         "original_url": "https://clicks.com"
@@ -98,6 +107,19 @@ def test_click_counter(client):
     stats = client.get(f"/api/links/{short_code}/stats").json()
     assert stats["clicks"] == 1
 
+def test_click_counter_counts_cache_hits(client):
+    create_res = client.post("/api/links/shorten", json={
+        "original_url": "https://cached-clicks.com"
+    })
+    short_code = create_res.json()["short_url"].split("/")[-1]
+
+    for _ in range(3):
+        response = client.get(f"/api/links/{short_code}", follow_redirects=False)
+        assert response.status_code == 307
+    stats = client.get(f"/api/links/{short_code}/stats").json()
+    assert stats["clicks"] == 3
+    assert stats["last_used_at"] is not None
+
 def test_create_link_with_existing_tag_race_condition(client, db):
     response = client.post(
             "/api/links/shorten",
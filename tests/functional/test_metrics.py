@@ -0,0 +1,62 @@
+import asyncio
+import redis.asyncio as aioredis
+from datetime import datetime, timedelta
+from prometheus_client import REGISTRY
+from src.url.models import Link
+from src.clean_exp_link import cleanup_expired_links
+from tests.conftest import TestingAsyncSessionLocal, TEST_REDIS_URL
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_redirect_metrics(client):
+    route = {"method": "GET", "route": "/api/links/{short_code}"}
+    redirects = sample("http_requests_total", status="307", **route)
+    not_found = sample("http_requests_total", status="404", **route)
+    redis_misses = sample("redirect_cache_lookups_total", layer="redis", outcome="miss")
+    l1_hits = sample("redirect_cache_lookups_total", layer="l1", outcome="hit")
+    l1_negative = sample("redirect_cache_lookups_total", layer="l1", outcome="negative_hit")
+
+    for _ in range(2):
+        client.get("/api/links/active1", follow_redirects=False)
+        client.get("/api/links/nosuchcode", follow_redirects=False)
+
+    assert sample("http_requests_total", status="307", **route) == redirects + 2
+    assert sample("http_requests_total", status="404", **route) == not_found + 2
+    assert sample("redirect_cache_lookups_total", layer="redis", outcome="miss") == redis_misses + 2
+    assert sample("redirect_cache_lookups_total", layer="l1", outcome="hit") == l1_hits + 1
+    assert sample("redirect_cache_lookups_total", layer="l1", outcome="negative_hit") == l1_negative + 1
+    assert sample("http_request_duration_seconds_count", **route) >= 4
+
+
+def test_metrics_endpoint(client):
+    client.get("/api/links/active1", follow_redirects=False)
+    client.get("/no/such/path")
+
+    body = client.get("/metrics").text
+    assert 'route="unmatched"' in body
+    assert "redis_command_duration_seconds_bucket" in body
+    assert "db_pool_checked_out" in body
+    assert "db_pool_wait_seconds_count" in body
+
+
+def test_cleanup_metrics(db):
+    db.add(Link(original_url="https://expired.com", short_code="exp0", expires_at=datetime.utcnow() - timedelta(hours=1), is_active=True))
+    db.commit()
+    runs = sample("cleanup_runs_total", result="ok")
+    deactivated = sample("cleanup_rows_total", action="deactivated")
+
+    async def run():
+        redis = aioredis.from_url(TEST_REDIS_URL)
+        try:
+            await cleanup_expired_links(loop_once=True, session_factory=TestingAsyncSessionLocal, redis=redis)
+        finally:
+            await redis.aclose()
+
+    asyncio.run(run())
+
+    assert sample("cleanup_runs_total", result="ok") == runs + 1
+    assert sample("cleanup_rows_total", action="deactivated") == deactivated + 1
+    assert sample("cleanup_run_duration_seconds_count") >= 1
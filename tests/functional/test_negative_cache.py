@@ -0,0 +1,62 @@
+import redis
+from datetime import datetime, timedelta
+from src.url.models import Link
+from src.url.redirect_cache import NOT_FOUND, EXPIRED, DELETED, redirect_key
+from tests.conftest import TEST_REDIS_URL
+
+
+def get_cached(short_code):
+    client = redis.Redis.from_url(TEST_REDIS_URL)
+    value = client.get(redirect_key(short_code))
+    client.close()
+    return value
+
+
+def test_unknown_code_is_negatively_cached(client):
+    response = client.get("/api/links/nosuchcode", follow_redirects=False)
+    assert response.status_code == 404
+    assert get_cached("nosuchcode") == NOT_FOUND
+
+    response = client.get("/api/links/nosuchcode", follow_redirects=False)
+    assert response.status_code == 404
+
+
+def test_create_clears_negative_entry(client):
+    client.get("/api/links/latecode", follow_redirects=False)
+    assert get_cached("latecode") == NOT_FOUND
+
+    client.post("/api/links/shorten", json={"original_url": "https://late.com", "custom_alias": "latecode"})
+    response = client.get("/api/links/latecode", follow_redirects=False)
+
+    assert response.status_code == 307
+    assert response.headers["location"] == "https://late.com"
+
+
+def test_expired_link_is_cached_as_gone(client, db):
+    db.add(Link(original_url="https://old.com", short_code="oldlink",
+                expires_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.commit()
+
+    assert client.get("/api/links/oldlink", follow_redirects=False).status_code == 410
+    assert get_cached("oldlink") == EXPIRED
+    assert client.get("/api/links/oldlink", follow_redirects=False).status_code == 410
+
+
+def test_deactivated_link_is_gone_before_marker(client):
+    # чистильщик уже снял is_active, но метку EXPIRED в Redis ещё не положил
+    assert client.get("/api/links/inactive1", follow_redirects=False).status_code == 410
+    assert get_cached("inactive1") == EXPIRED
+
+
+def test_delete_leaves_tombstone(authorized_client):
+    authorized_client.post("/api/links/shorten", json={"original_url": "https://gone.com", "custom_alias": "gonelink"})
+    authorized_client.get("/api/links/gonelink", follow_redirects=False)
+
+    assert authorized_client.delete("/api/links/gonelink").status_code == 200
+    assert get_cached("gonelink") == DELETED
+    assert authorized_client.get("/api/links/gonelink", follow_redirects=False).status_code == 404
+
+    authorized_client.post("/api/links/shorten", json={"original_url": "https://back.com", "custom_alias": "gonelink"})
+    response = authorized_client.get("/api/links/gonelink", follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"] == "https://back.com"
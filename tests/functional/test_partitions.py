@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from redis import asyncio as aioredis
+from sqlalchemy import text
+from unittest.mock import AsyncMock
+
+from src.clean_exp_link import sweep_expired_links
+from src.url.models import Link
+from src.url.partitions import partition_links, unpartition_links, ensure_partitions
+from tests.conftest import TestingAsyncSessionLocal, TEST_REDIS_URL, engine
+
+
+@pytest.fixture
+def partitioned(db):
+    with engine.begin() as conn:
+        partition_links(conn, "day")
+    try:
+        yield
+    finally:
+        db.rollback()
+        with engine.begin() as conn:
+            unpartition_links(conn)
+
+
+def partitions():
+    with engine.connect() as conn:
+        return set(conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'links'::regclass"
+        )).scalars())
+
+
+def test_short_code_unique_across_partitions(partitioned, client, db):
+    response = client.post("/api/links/shorten", json={"original_url": "https://a.com", "custom_alias": "part1"})
+    assert response.status_code == 201
+
+    # та же ссылка с другим сроком попадёт в другую секцию, но код занят
+    db.add(Link(original_url="https://b.com", short_code="part1", expires_at=datetime.utcnow() + timedelta(days=5)))
+    with pytest.raises(Exception, match="link_codes_pkey"):
+        db.commit()
+    db.rollback()
+
+    response = client.post("/api/links/shorten/batch", json=[
+        {"original_url": "https://c.com", "custom_alias": "part1"},
+        {"original_url": "https://d.com", "custom_alias": "part2"},
+    ])
+    assert response.json()["created"] == 1
+    assert response.json()["results"][0]["error"]
+
+
+def test_sweeper_drops_old_partitions(partitioned, db):
+    now = datetime.utcnow()
+    old = now - timedelta(days=10)
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE links_old PARTITION OF links FOR VALUES FROM ('{old:%Y-%m-%d}') TO ('{old + timedelta(days=1):%Y-%m-%d}')"))
+    db.add_all([
+        Link(original_url="https://old.com", short_code=f"old{i}", expires_at=old + timedelta(hours=1), is_active=False)
+        for i in range(3)
+    ])
+    db.commit()
+
+    deactivated, deleted, done = asyncio.run(sweep_expired_links(TestingAsyncSessionLocal, AsyncMock()))
+
+    assert (deleted, done) == (3, True)
+    assert "links_old" not in partitions()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM link_codes WHERE short_code LIKE 'old%'")).scalar() == 0
+
+
+def test_sweeper_deletes_old_links_from_default_partition(partitioned, db):
+    # для этого диапазона секции нет, ссылки легли в links_default
+    old = datetime.utcnow() - timedelta(days=400)
+    db.add_all([
+        Link(original_url="https://old.com", short_code=f"dflt{i}", expires_at=old, is_active=False)
+        for i in range(3)
+    ] + [Link(original_url="https://forever.com", short_code="dfltkeep")])
+    db.commit()
+
+    async def sweep():
+        redis = aioredis.from_url(TEST_REDIS_URL)
+        try:
+            return await sweep_expired_links(TestingAsyncSessionLocal, redis, batch_size=2)
+        finally:
+            await redis.aclose()
+
+    deactivated, deleted, done = asyncio.run(sweep())
+
+    assert (deleted, done) == (3, True)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT short_code FROM links_default WHERE short_code LIKE 'dflt%'")).scalars().all() == ["dfltkeep"]
+        assert conn.execute(text("SELECT count(*) FROM link_codes WHERE short_code LIKE 'dflt%'")).scalar() == 1
+
+
+def test_ensure_partitions_creates_future_ranges(partitioned):
+    far = datetime.utcnow() + timedelta(days=60)
+
+    async def run():
+        async with TestingAsyncSessionLocal() as session:
+            return await ensure_partitions(session, far)
+
+    assert asyncio.run(run()) == 8
+    assert f"links_p{far:%Y%m%d}" in partitions()
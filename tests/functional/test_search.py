@@ -1,3 +1,5 @@
+import json
+
 from src.auth.models import User
 from src.url.models import Link, Tag
 
@@ -59,4 +61,68 @@ def test_combined_search(client, db):
         "tag_name=combined"
     )
     assert response.status_code == 200
-    assert len(response.json()) == 1
\ No newline at end of file
+    assert len(response.json()) == 1
+
+
+def test_search_by_host(client, db):
+    db.add_all([
+        Link(original_url="https://Docs.Example.com/guide", short_code="host123"),
+        Link(original_url="https://example.com/docs.example.com", short_code="host456"),
+    ])
+    db.commit()
+
+    response = client.get("/api/links/search?host=docs.example.com")
+    assert response.status_code == 200
+    assert [item["short_code"] for item in response.json()] == ["host123"]
+
+
+def test_search_escapes_like_wildcards(client, db):
+    db.add_all([
+        Link(original_url="https://example.com/100%_off", short_code="pct123"),
+        Link(original_url="https://example.com/1000-off", short_code="pct456"),
+    ])
+    db.commit()
+
+    response = client.get("/api/links/search", params={"original_url": "100%_"})
+    assert response.status_code == 200
+    assert [item["short_code"] for item in response.json()] == ["pct123"]
+
+
+def test_search_keyset_pagination(client, db):
+    # одна транзакция - одинаковый created_at, порядок держится на id
+    db.add_all([Link(original_url=f"https://paged.com/{i}", short_code=f"paged{i}") for i in range(5)])
+    db.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"original_url": "paged.com", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/links/search", params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        seen += [item["short_code"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == [f"paged{i}" for i in reversed(range(5))]
+
+
+def test_search_invalid_cursor(client):
+    response = client.get("/api/links/search", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_search_stream_ndjson(client, db):
+    tag = Tag(name="streamed")
+    db.add_all([tag] + [Link(original_url=f"https://stream.com/{i}", short_code=f"stream{i}", tag=tag) for i in range(3)])
+    db.commit()
+
+    response = client.get("/api/links/search", params={"tag_name": "streamed", "stream": "true", "limit": 1})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["short_code"] for row in rows] == ["stream2", "stream1", "stream0"]
+    assert all(row["tag_name"] == "streamed" for row in rows)
@@ -0,0 +1,45 @@
+from src.url import url, visitors
+
+
+def shorten(client, alias):
+    client.post("/api/links/shorten", json={"original_url": f"https://{alias}.com", "custom_alias": alias})
+
+
+def visit(client, short_code, user_agent):
+    return client.get(f"/api/links/{short_code}", headers={"User-Agent": user_agent}, follow_redirects=False)
+
+
+def test_stats_count_unique_visitors(client):
+    shorten(client, "uniq1")
+    # второй и третий запросы идут через быстрый путь, посетителей он считает так же
+    for user_agent in ("browser-a", "browser-b", "browser-a"):
+        assert visit(client, "uniq1", user_agent).status_code == 307
+
+    stats = client.get("/api/links/uniq1/stats").json()
+    assert stats["clicks"] == 3
+    assert stats["unique_visitors"] == 2
+    assert stats["unique_visitors_window"] is None
+
+
+def test_window_needs_daily_counters(client, monkeypatch):
+    shorten(client, "uniq2")
+    assert client.get("/api/links/uniq2/stats", params={"days": 7}).status_code == 400
+
+    monkeypatch.setattr(visitors, "VISITORS_DAILY_DAYS", 7)
+    monkeypatch.setattr(url, "VISITORS_DAILY_DAYS", 7)
+    visit(client, "uniq2", "browser-a")
+    visit(client, "uniq2", "browser-b")
+
+    stats = client.get("/api/links/uniq2/stats", params={"days": 7}).json()
+    assert stats["unique_visitors_window"] == 2
+
+
+def test_reused_code_starts_from_zero(authorized_client):
+    shorten(authorized_client, "reused1")
+    visit(authorized_client, "reused1", "browser-a")
+    assert authorized_client.get("/api/links/reused1/stats").json()["unique_visitors"] == 1
+
+    authorized_client.delete("/api/links/reused1")
+    shorten(authorized_client, "reused1")
+
+    assert authorized_client.get("/api/links/reused1/stats").json()["unique_visitors"] == 0
@@ -0,0 +1,61 @@
+"""Соглашения о нагрузочном наборе данных, общие для seed.py и locustfile.py.
+
+Размеры берутся из окружения, сидер и locust нужно запускать с одинаковыми LOAD_*.
+"""
+import math
+import os
+import random
+
+LINKS = int(os.getenv("LOAD_LINKS", 1_000_000))
+TAGS = int(os.getenv("LOAD_TAGS", 10_000))
+USERS = int(os.getenv("LOAD_USERS", 1_000))
+HOSTS = int(os.getenv("LOAD_HOSTS", 50_000))
+ZIPF_S = float(os.getenv("LOAD_ZIPF_S", 1.1)) # показатель распределения популярности ссылок, > 1
+
+USER_PASSWORD = "loadtest"
+
+# ранг популярности -> номер ссылки: без перемешивания горячие ссылки лежали бы подряд
+# в первых страницах таблицы, и кэш Postgres выглядел бы лучше, чем на живых данных.
+# Шаг около LINKS / золотое сечение разносит соседние ранги по всей таблице.
+_step = max(1, int(LINKS * 0.6180339887))
+while math.gcd(_step, LINKS) != 1:
+    _step += 1
+SCRAMBLE_STEP = _step
+
+
+def short_code(n: int) -> str:
+    # дефис не выдаёт ни один из аллокаторов, коды сидера с ними не пересекаются
+    return f"ld-{n}"
+
+
+def user_email(n: int) -> str:
+    return f"load-user-{n}@example.com"
+
+
+def tag_name(n: int) -> str:
+    return f"load-tag-{n}"
+
+
+def host(n: int) -> str:
+    return f"site{n % HOSTS}.example.com"
+
+
+def original_url(n: int) -> str:
+    return f"https://{host(n)}/page/{n}"
+
+
+def zipf_rank(n: int, s: float = ZIPF_S, rng: random.Random = random) -> int:
+    """Ранг 1..n с вероятностью ~ 1/rank^s. Метод отбора Деврое, без таблицы на n элементов."""
+    b = 2 ** (s - 1)
+    while True:
+        u = 1.0 - rng.random()
+        v = rng.random()
+        x = math.floor(u ** (-1 / (s - 1)))
+        t = (1 + 1 / x) ** (s - 1)
+        if x <= n and v * x * (t - 1) / (b - 1) <= t / b:
+            return x
+
+
+def popular_link(rng: random.Random = random) -> int:
+    """Номер ссылки 0..LINKS-1, популярность по Zipf."""
+    return (zipf_rank(LINKS, rng=rng) - 1) * SCRAMBLE_STEP % LINKS
@@ -1,32 +1,133 @@
-from locust import HttpUser, task, between
+"""Профили нагрузки. Коды, пользователи и теги - из нагрузочного набора (seed.py, dataset.py).
+
+По умолчанию все профили идут вместе в пропорции weight, отдельный профиль - по имени класса:
+    locust -f tests/load_test/locustfile.py --host http://localhost:8000 RedirectUser
+"""
+import random
 import secrets
 
-class ShortenerUser(HttpUser):
-    wait_time = between(1, 3)
-    short_code = None
+from locust import HttpUser, task, between
 
-    def gen_short_code(self, length: int = 10) -> str:
-        alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
-        return ''.join(secrets.choice(alphabet) for _ in range(length))
+import dataset
+
+CODE_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+# что обычно перебирают сканеры
+SCANNER_PATHS = ("/.env", "/wp-login.php", "/admin", "/.git/config", "/phpmyadmin/", "/api/v1/users", "/server-status")
+
+
+class RedirectUser(HttpUser):
+    """Основной трафик: переходы по коротким ссылкам, популярность по Zipf."""
+    weight = 80
+    wait_time = between(0.1, 0.5)
 
     @task
-    def log(self):
-        self.client.post(
-            "/auth/logout"
-        )
-    @task
-    def create_link(self):
-        self.short_code = self.gen_short_code()
-        self.client.post(
-            "/api/links/shorten",
-            json={
-            "original_url": "https://example.com/test",
-            "custom_alias": f"{self.short_code}"
-                 }
-        )
+    def redirect(self):
+        code = dataset.short_code(dataset.popular_link())
+        with self.client.get(f"/api/links/{code}", allow_redirects=False,
+                             name="/api/links/[short_code]", catch_response=True) as response:
+            # 404/410 - истёкшие ссылки набора, это нормальный ответ
+            if response.status_code in (307, 404, 410):
+                response.success()
+            else:
+                response.failure(f"status {response.status_code}")
+
+
+class CreatorUser(HttpUser):
+    """Зарегистрированный пользователь: создаёт, правит и просматривает свои ссылки."""
+    weight = 5
+    wait_time = between(1, 3)
+
+    def on_start(self):
+        self.created = []
+        self.client.post("/auth/login", json={
+            "email": dataset.user_email(random.randrange(dataset.USERS)),
+            "password": dataset.USER_PASSWORD,
+        })
+
+    def new_link(self) -> dict:
+        link = {"original_url": f"https://{dataset.host(random.randrange(dataset.HOSTS))}/new/{secrets.token_hex(6)}"}
+        if random.random() < 0.4:
+            link["tag_name"] = dataset.tag_name(random.randrange(dataset.TAGS))
+        return link
+
+    @task(5)
+    def shorten(self):
+        response = self.client.post("/api/links/shorten", json=self.new_link())
+        if response.status_code == 201:
+            self.created.append(response.json()["short_url"].rsplit("/", 1)[-1])
+            del self.created[:-50]
+
+    @task(1)
+    def shorten_batch(self):
+        self.client.post("/api/links/shorten/batch", json=[self.new_link() for _ in range(20)])
+
+    @task(2)
+    def my_links(self):
+        response = self.client.get("/api/links/my", params={"limit": 50})
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor and random.random() < 0.3:
+            self.client.get("/api/links/my", params={"limit": 50, "cursor": cursor}, name="/api/links/my?cursor")
+
+    @task(1)
+    def update_link(self):
+        if self.created:
+            self.client.put(f"/api/links/{random.choice(self.created)}", name="/api/links/[short_code]",
+                            json={"original_url": f"https://example.com/updated/{secrets.token_hex(4)}"})
+
+    @task(1)
+    def stats(self):
+        if self.created:
+            self.client.get(f"/api/links/{random.choice(self.created)}/stats", name="/api/links/[short_code]/stats")
+
+
+class SearchUser(HttpUser):
+    """Поиск: подстрока url, точный домен, метка; иногда листает вторую страницу."""
+    weight = 10
+    wait_time = between(0.5, 2)
+
+    def search(self, params: dict, name: str):
+        with self.client.get("/api/links/search", params=params, name=name, catch_response=True) as response:
+            if response.status_code in (200, 404):
+                response.success()
+            else:
+                response.failure(f"status {response.status_code}")
+                return
+            cursor = response.headers.get("X-Next-Cursor")
+        if cursor and random.random() < 0.2:
+            self.client.get("/api/links/search", params={**params, "cursor": cursor}, name=f"{name}&cursor")
 
     @task(3)
-    def redirect_link(self):
-        if self.short_code:
-            self.client.get(f"/api/links/{self.short_code}")
+    def by_url(self):
+        self.search({"original_url": f"/page/{dataset.popular_link()}"}, "/api/links/search?original_url")
+
+    @task(2)
+    def by_host(self):
+        self.search({"host": dataset.host(random.randrange(dataset.HOSTS))}, "/api/links/search?host")
+
+    @task(1)
+    def by_tag(self):
+        self.search({"tag_name": dataset.tag_name(random.randrange(dataset.TAGS))}, "/api/links/search?tag_name")
+
+
+class ScannerUser(HttpUser):
+    """Перебор несуществующих кодов и типовых путей: проверяет отрицательный кэш и 404 без базы."""
+    weight = 5
+    wait_time = between(0.05, 0.2)
+
+    @task(4)
+    def random_code(self):
+        code = "".join(secrets.choice(CODE_ALPHABET) for _ in range(8))
+        with self.client.get(f"/api/links/{code}", allow_redirects=False,
+                             name="/api/links/[random]", catch_response=True) as response:
+            if response.status_code in (404, 307):
+                response.success()
+            else:
+                response.failure(f"status {response.status_code}")
 
+    @task(1)
+    def probe(self):
+        with self.client.get(random.choice(SCANNER_PATHS), name="[scanner]", catch_response=True) as response:
+            if response.status_code in (404, 405):
+                response.success()
+            else:
+                response.failure(f"status {response.status_code}")
@@ -0,0 +1,25 @@
+"""Ступенчатая нагрузка: каждые LOAD_STEP_TIME секунд добавляется LOAD_STEP_USERS пользователей.
+
+Подключается вторым файлом, без него locust работает с числом пользователей из UI/-u:
+    locust -f tests/load_test/locustfile.py,tests/load_test/shapes.py --host http://localhost:8000
+"""
+import os
+
+from locust import LoadTestShape
+
+
+class StepLoadShape(LoadTestShape):
+    step_users = int(os.getenv("LOAD_STEP_USERS", 50))
+    step_time = int(os.getenv("LOAD_STEP_TIME", 60)) # sec на одной ступени
+    max_users = int(os.getenv("LOAD_MAX_USERS", 500))
+    spawn_rate = float(os.getenv("LOAD_SPAWN_RATE", 10))
+    # на последней ступени держим нагрузку ещё столько же шагов, потом останавливаемся
+    hold_steps = int(os.getenv("LOAD_HOLD_STEPS", 3))
+
+    def tick(self):
+        run_time = self.get_run_time()
+        steps = self.max_users // self.step_users
+        if run_time >= (steps + self.hold_steps) * self.step_time:
+            return None
+        current_step = int(run_time // self.step_time) + 1
+        return min(current_step * self.step_users, self.max_users), self.spawn_rate
@@ -1,17 +1,83 @@
 import asyncio
-from unittest.mock import Mock, patch
-import pytest
+from unittest.mock import AsyncMock, Mock, patch
+import redis.asyncio as aioredis
 from src.url.models import Link
-from datetime import datetime
-from src.clean_exp_link import cleanup_expired_links
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from src.clean_exp_link import cleanup_expired_links, sweep_expired_links, sweep_as_leader, CLEANUP_LOCK_ID
+from src.url.redirect_cache import redirect_key, EXPIRED
+from tests.conftest import TestingAsyncSessionLocal, TEST_REDIS_URL, engine
 
 def test_cleanup_database_error():
-    mock_session = Mock()
+    mock_session = AsyncMock()
+    mock_session.__aenter__.return_value = mock_session
+    mock_session.execute.return_value = Mock()
     mock_session.commit.side_effect = Exception("DB error")
 
-    with patch("src.clean_exp_link.get_db", return_value=iter([mock_session])):
-        from src.clean_exp_link import cleanup_expired_links
+    def sweep_with_mock_session(session_factory, redis):
+        return sweep_expired_links(Mock(return_value=mock_session), redis)
+
+    with patch("src.clean_exp_link.sweep_as_leader", new=sweep_with_mock_session):
         with patch("src.clean_exp_link.logger.error") as mock_logger_error:
-            asyncio.run(cleanup_expired_links(loop_once=True))
+            asyncio.run(cleanup_expired_links(loop_once=True, redis=AsyncMock()))
             mock_logger_error.assert_called_with("Cleanup error: DB error")
 
+
+def test_sweep_in_batches(db):
+    now = datetime.utcnow()
+    db.add_all(
+        [Link(original_url="https://expired.com", short_code=f"exp{i}", expires_at=now - timedelta(hours=1), is_active=True) for i in range(5)]
+        + [Link(original_url="https://old.com", short_code=f"old{i}", expires_at=now - timedelta(days=3), is_active=False) for i in range(3)]
+        + [Link(original_url="https://fresh.com", short_code="fresh", expires_at=now + timedelta(days=1), is_active=True)]
+    )
+    db.commit()
+
+    async def run():
+        redis = aioredis.from_url(TEST_REDIS_URL)
+        await redis.set(redirect_key("exp0"), b"https://expired.com")
+        await redis.set(redirect_key("old0"), EXPIRED)
+        try:
+            result = await sweep_expired_links(TestingAsyncSessionLocal, redis, batch_size=2)
+            return result, await redis.get(redirect_key("exp0")), await redis.get(redirect_key("old0"))
+        finally:
+            await redis.aclose()
+
+    (deactivated, deleted, done), exp_cached, old_cached = asyncio.run(run())
+
+    assert (deactivated, deleted, done) == (5, 3, True)
+    assert exp_cached == EXPIRED
+    assert old_cached is None
+    db.expire_all()
+    assert db.query(Link).filter(Link.short_code.like("exp%"), Link.is_active == False).count() == 5
+    assert db.query(Link).filter(Link.short_code.like("old%")).count() == 0
+    assert db.query(Link).filter(Link.short_code == "fresh", Link.is_active == True).count() == 1
+
+
+def test_sweep_stops_at_time_budget(db):
+    db.add(Link(original_url="https://expired.com", short_code="exp0", expires_at=datetime.utcnow() - timedelta(hours=1), is_active=True))
+    db.commit()
+
+    deactivated, deleted, done = asyncio.run(sweep_expired_links(TestingAsyncSessionLocal, AsyncMock(), time_budget=0))
+
+    assert (deactivated, deleted, done) == (0, 0, False)
+
+
+def test_only_one_sweeper_runs(db):
+    db.add(Link(original_url="https://expired.com", short_code="exp0", expires_at=datetime.utcnow() - timedelta(hours=1), is_active=True))
+    db.commit()
+
+    async def sweep():
+        redis = aioredis.from_url(TEST_REDIS_URL)
+        try:
+            return await sweep_as_leader(TestingAsyncSessionLocal, redis)
+        finally:
+            await redis.aclose()
+
+    with engine.connect() as other_worker:
+        other_worker.execute(text("SELECT pg_advisory_lock(:id)"), {"id": CLEANUP_LOCK_ID})
+        assert asyncio.run(sweep()) is None
+        other_worker.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": CLEANUP_LOCK_ID})
+
+    assert asyncio.run(sweep()) == (1, 0, True)
+    # блокировка отпущена после прохода
+    assert asyncio.run(sweep()) == (0, 0, True)
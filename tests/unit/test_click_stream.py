@@ -0,0 +1,60 @@
+import datetime
+import pytest
+from redis import asyncio as aioredis
+from src.url import click_stream
+from src.url.models import Link, LinkClicksHourly
+from src.url.clicks import record_click
+from src.url.click_stream import rollup_clicks, ensure_group, truncate, CLICK_STREAM_KEY, ROLLUP_GROUP
+from tests.conftest import TestingAsyncSessionLocal, TEST_REDIS_URL
+
+
+def rollups(db):
+    db.expire_all()
+    rows = db.query(Link.short_code, LinkClicksHourly.hour, LinkClicksHourly.clicks).join(
+        Link, Link.id == LinkClicksHourly.link_id
+    )
+    return {code: (hour, clicks) for code, hour, clicks in rows}
+
+
+@pytest.mark.asyncio
+async def test_rollup_aggregates_stream_into_hours(db):
+    db.add_all([
+        Link(original_url="https://roll1.com", short_code="roll1"),
+        Link(original_url="https://roll2.com", short_code="roll2"),
+    ])
+    db.commit()
+
+    redis = aioredis.from_url(TEST_REDIS_URL)
+    for code in ("roll1", "roll1", "roll2", "ghost1", "roll1"):
+        await record_click(redis, code)
+
+    assert await rollup_clicks(redis, TestingAsyncSessionLocal, consumer="test") == 5
+    # подтверждённые события из потока удаляются
+    assert await redis.xlen(CLICK_STREAM_KEY) == 0
+
+    await record_click(redis, "roll2")
+    assert await rollup_clicks(redis, TestingAsyncSessionLocal, consumer="test", batch_size=2) == 1
+    await redis.aclose()
+
+    hour = truncate(datetime.datetime.utcnow(), "hour")
+    assert rollups(db) == {"roll1": (hour, 3), "roll2": (hour, 2)}
+
+
+@pytest.mark.asyncio
+async def test_rollup_claims_events_of_dead_consumer(db, monkeypatch):
+    db.add(Link(original_url="https://roll3.com", short_code="roll3"))
+    db.commit()
+    monkeypatch.setattr(click_stream, "CLICK_ROLLUP_CLAIM_IDLE", 0)
+
+    redis = aioredis.from_url(TEST_REDIS_URL)
+    await ensure_group(redis)
+    await record_click(redis, "roll3")
+    await record_click(redis, "roll3")
+    # воркер прочитал события и упал, не подтвердив их
+    await redis.xreadgroup(ROLLUP_GROUP, "dead", {CLICK_STREAM_KEY: ">"})
+
+    assert await rollup_clicks(redis, TestingAsyncSessionLocal, consumer="alive") == 2
+    assert (await redis.xpending(CLICK_STREAM_KEY, ROLLUP_GROUP))["pending"] == 0
+    await redis.aclose()
+
+    assert rollups(db)["roll3"][1] == 2
@@ -0,0 +1,72 @@
+import pytest
+from redis import asyncio as aioredis
+from src.url.models import Link
+from src.url import clicks
+from src.url.clicks import record_click, flush_clicks, get_pending_clicks, PENDING_CLICKS_KEY, FLUSHING_CLICKS_KEY
+from tests.conftest import TestingAsyncSessionLocal, TEST_REDIS_URL
+
+
+@pytest.mark.asyncio
+async def test_flush_clicks_writes_batched_deltas(db):
+    db.add_all([
+        Link(original_url="https://flush1.com", short_code="flush1", clicks=2),
+        Link(original_url="https://flush2.com", short_code="flush2", clicks=0),
+    ])
+    db.commit()
+
+    redis = aioredis.from_url(TEST_REDIS_URL)
+    for code in ("flush1", "flush1", "flush2"):
+        await record_click(redis, code)
+
+    assert (await get_pending_clicks(redis, "flush1"))[0] == 2
+    assert await flush_clicks(redis, TestingAsyncSessionLocal, force=True) == 2
+    assert not await redis.exists(PENDING_CLICKS_KEY, FLUSHING_CLICKS_KEY)
+    await redis.aclose()
+
+    db.expire_all()
+    flush1 = db.query(Link).filter(Link.short_code == "flush1").first()
+    flush2 = db.query(Link).filter(Link.short_code == "flush2").first()
+    assert flush1.clicks == 4
+    assert flush2.clicks == 1
+    assert flush1.last_used_at is not None
+
+
+@pytest.mark.asyncio
+async def test_flush_clicks_waits_for_staleness():
+    redis = aioredis.from_url(TEST_REDIS_URL)
+    await record_click(redis, "fresh1")
+
+    assert await flush_clicks(redis, TestingAsyncSessionLocal) == 0
+    assert (await get_pending_clicks(redis, "fresh1"))[0] == 1
+    await redis.aclose()
+
+
+@pytest.mark.asyncio
+async def test_replayed_flush_is_not_counted_twice(db, monkeypatch):
+    db.add(Link(original_url="https://flush3.com", short_code="flush3", clicks=0))
+    db.commit()
+
+    redis = aioredis.from_url(TEST_REDIS_URL)
+    await record_click(redis, "flush3")
+    await record_click(redis, "flush3")
+
+    # воркер упал после commit, не успев удалить flushing из Redis
+    evaluate = redis.eval
+
+    async def crash(script, *args):
+        if script == clicks.DELETE_FLUSHED_SCRIPT:
+            raise ConnectionError("воркер упал")
+        return await evaluate(script, *args)
+
+    monkeypatch.setattr(redis, "eval", crash)
+    with pytest.raises(ConnectionError):
+        await flush_clicks(redis, TestingAsyncSessionLocal, force=True)
+    monkeypatch.undo()
+    assert await redis.exists(FLUSHING_CLICKS_KEY)
+
+    assert await flush_clicks(redis, TestingAsyncSessionLocal, force=True) == 0
+    assert not await redis.exists(FLUSHING_CLICKS_KEY, clicks.FLUSHING_ID_KEY)
+    await redis.aclose()
+
+    db.expire_all()
+    assert db.query(Link).filter(Link.short_code == "flush3").first().clicks == 2
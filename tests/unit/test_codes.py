@@ -0,0 +1,29 @@
+import pytest
+from src.url.codes import encode_id, HiLoCodeAllocator, ALPHABET
+from tests.conftest import TestingAsyncSessionLocal
+
+
+def test_encode_id_is_collision_free():
+    codes = {encode_id(i) for i in range(100_000)}
+    assert len(codes) == 100_000
+    assert all(len(code) == 8 and set(code) <= set(ALPHABET) for code in codes)
+
+
+def test_encode_id_scrambles_neighbours():
+    assert encode_id(1000)[:4] != encode_id(1001)[:4]
+
+
+def test_encode_id_out_of_range():
+    with pytest.raises(ValueError):
+        encode_id(len(ALPHABET) ** 8)
+
+
+@pytest.mark.asyncio
+async def test_hilo_reserves_block_once():
+    allocator = HiLoCodeAllocator(block_size=50)
+    async with TestingAsyncSessionLocal() as db:
+        ids = [await allocator.next_id(db) for _ in range(120)]
+
+    assert len(set(ids)) == 120
+    # 120 id из блоков по 50 - ровно три nextval
+    assert len({i // 50 for i in ids}) == 3
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import logging
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from src.diagnostics import install_slow_query_log, current_scope, ProfilerMiddleware
+from tests.conftest import TEST_ASYNC_DATABASE_URL
+
+
+@pytest.mark.asyncio
+async def test_slow_query_logged_with_route(caplog):
+    engine = create_async_engine(TEST_ASYNC_DATABASE_URL, poolclass=NullPool)
+    install_slow_query_log(engine.sync_engine, threshold_ms=5)
+    token = current_scope.set({"path": "/api/links/abc", "path_params": {"short_code": "abc"}})
+
+    with caplog.at_level(logging.WARNING, logger="src.diagnostics"):
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                await conn.execute(text("SELECT pg_sleep(0.02)"))
+        finally:
+            current_scope.reset(token)
+            await engine.dispose()
+
+    slow = [r.getMessage() for r in caplog.records if "Медленный запрос" in r.getMessage()]
+    assert len(slow) == 1
+    assert "short_code=abc" in slow[0]
+    assert "pg_sleep" in slow[0]
+
+
+def make_client(tmp_path):
+    app = FastAPI()
+
+    @app.get("/items/{short_code}")
+    async def item(short_code: str):
+        await asyncio.sleep(0.01)
+        return {"code": short_code}
+
+    app.add_middleware(ProfilerMiddleware, secret="letmein", directory=str(tmp_path))
+    return TestClient(app)
+
+
+def test_profile_saved_only_with_secret(tmp_path):
+    with make_client(tmp_path) as client:
+        plain = client.get("/items/abc")
+        wrong = client.get("/items/abc", headers={"X-Profile": "guess"})
+        profiled = client.get("/items/abc", headers={"X-Profile": "letmein"})
+
+    assert "x-profile-file" not in plain.headers
+    assert "x-profile-file" not in wrong.headers
+    assert profiled.json() == {"code": "abc"}
+
+    filename = profiled.headers["x-profile-file"]
+    assert "items_short_code" in filename
+    assert [p.name for p in tmp_path.iterdir()] == [filename]
+    profile = json.loads((tmp_path / filename).read_text())
+    assert profile["$schema"].startswith("https://www.speedscope.app")
@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from src.auth.hashing import PasswordHasher
+from src.auth.utils import hash_password
+
+
+def test_rounds_are_configurable():
+    # в conftest BCRYPT_ROUNDS=4
+    assert hash_password("secret").startswith("$2b$04$")
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_in_pool():
+    hasher = PasswordHasher(workers=1, max_pending=4)
+    try:
+        hashed = await hasher.hash("secret")
+        assert await hasher.verify("secret", hashed)
+        assert not await hasher.verify("wrong", hashed)
+    finally:
+        hasher.close()
+
+    stats = hasher.stats()
+    assert stats["completed"] == 3
+    assert stats["pending"] == 0
+    assert stats["max_ms"] >= stats["p50_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_fast():
+    hasher = PasswordHasher(workers=1, max_pending=2)
+    try:
+        results = await asyncio.gather(*(hasher.hash("secret") for _ in range(4)), return_exceptions=True)
+    finally:
+        hasher.close()
+
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 2
+    assert all(r.status_code == 503 for r in rejected)
+    assert hasher.stats()["rejected"] == 2
@@ -0,0 +1,71 @@
+import time
+from datetime import datetime, timedelta
+from src.url import redirect
+from src.url.models import Link
+from src.url.redirect_cache import RedirectCache, redirect_cache
+
+
+def test_lru_eviction_by_bytes():
+    entry_size = RedirectCache._entry_size("code0001", b"https://example.com/0")
+    cache = RedirectCache(max_bytes=entry_size * 2, ttl=60)
+
+    cache.set("code0001", b"https://example.com/0")
+    cache.set("code0002", b"https://example.com/1")
+    assert cache.get("code0001") == b"https://example.com/0"
+    cache.set("code0003", b"https://example.com/2")
+
+    assert cache.get("code0002") is None
+    assert cache.get("code0001") == b"https://example.com/0"
+    assert cache.stats()["evictions"] == 1
+    assert cache.size_bytes <= cache.max_bytes
+
+
+def test_ttl_expiration():
+    cache = RedirectCache(max_bytes=1024 * 1024, ttl=0)
+    cache.set("expired", b"https://example.com")
+    time.sleep(0.001)
+
+    assert cache.get("expired") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.size_bytes == 0
+
+
+def test_invalidate_and_counters():
+    cache = RedirectCache(max_bytes=1024 * 1024, ttl=60)
+    cache.set("code", b"https://example.com")
+    cache.get("code")
+    cache.invalidate("code")
+    cache.get("code")
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["invalidations"] == 1
+    assert stats["entries"] == 0
+
+
+def test_update_invalidates_local_cache(authorized_client):
+    create_res = authorized_client.post("/api/links/shorten", json={"original_url": "https://before.com"})
+    short_code = create_res.json()["short_url"].split("/")[-1]
+    authorized_client.get(f"/api/links/{short_code}", follow_redirects=False)
+    assert redirect_cache.get(short_code) == b"https://before.com"
+
+    authorized_client.put(f"/api/links/{short_code}", json={"original_url": "https://after.com"})
+    response = authorized_client.get(f"/api/links/{short_code}", follow_redirects=False)
+
+    assert response.headers["location"] == "https://after.com"
+    assert authorized_client.get("/api/cache/stats").json()["invalidations"] >= 1
+
+
+def test_local_cache_does_not_outlive_link(client, db, monkeypatch):
+    monkeypatch.setattr(redirect, "should_refresh_early", lambda *args: False)
+    db.add(Link(original_url="https://soon.com", short_code="soon1", expires_at=datetime.utcnow() + timedelta(seconds=1.5)))
+    db.commit()
+
+    assert client.get("/api/links/soon1", follow_redirects=False).status_code == 307
+    # второй воркер: L1 пуст, url берётся из Redis вместе с оставшимся сроком
+    redirect_cache.clear()
+    assert client.get("/api/links/soon1", follow_redirects=False).status_code == 307
+    time.sleep(2.1)
+
+    assert client.get("/api/links/soon1", follow_redirects=False).status_code == 410
@@ -1,65 +1,74 @@
 import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import patch, AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 from redis.exceptions import ConnectionError
-from src.main import app
-from src.url.url import generate_short_code
-
-client = TestClient(app)
+from src import cache
+from src.cache import get_redis
+from src.url.codes import generate_short_code
+from src.url.redirect_cache import DELETED
+from src.config import TOMBSTONE_TTL
 
 @pytest.mark.asyncio
-async def test_redis_connection_error():
-    with patch("src.url.url.aioredis.from_url", new_callable=AsyncMock) as mock_from_url:
-        mock_redis = AsyncMock()
-        mock_redis.get = AsyncMock(side_effect=ConnectionError("Redis connection failed"))
-        mock_from_url.return_value = mock_redis
+async def test_redis_connection_error(client):
+    mock_redis = AsyncMock()
+    mock_pipeline = MagicMock()
+    mock_pipeline.execute = AsyncMock(side_effect=ConnectionError("Redis connection failed"))
+    mock_redis.pipeline = MagicMock(return_value=mock_pipeline)
+    client.app.dependency_overrides[get_redis] = lambda: mock_redis
 
-        with pytest.raises(ConnectionError):
-            client.get("/api/links/test123")
+    with pytest.raises(ConnectionError):
+        client.get("/api/links/test123")
 
 @pytest.mark.asyncio
-async def test_redis_cache_update_on_delete():
-    with patch("src.url.url.aioredis.from_url", new_callable=AsyncMock) as mock_from_url:
-        mock_redis = AsyncMock()
-        mock_redis.hset = AsyncMock()
-        mock_from_url.return_value = mock_redis
+async def test_redis_cache_update_on_delete(client):
+    mock_redis = AsyncMock()
+    client.app.dependency_overrides[get_redis] = lambda: mock_redis
+
+    register_response = client.post(
+        "/auth/register",
+        json={"email": "deleter@test.com", "password": "pass"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "deleter@test.com", "password": "pass"}
+    )
+    token = login_response.cookies.get("access_token")
+
+    unique_alias = "test_del_" + generate_short_code()
+    create_response = client.post(
+        "/api/links/shorten",
+        json={"original_url": "https://redis-cache.com", "custom_alias": unique_alias},
+        cookies={"access_token": token}
+    )
 
-        register_response = client.post(
-            "/auth/register",
-            json={"email": "deleter@test.com", "password": "pass"}
-        )
-        login_response = client.post(
-            "/auth/login",
-            json={"email": "deleter@test.com", "password": "pass"}
-        )
-        token = login_response.cookies.get("access_token")
+    assert create_response.status_code == 201
 
-        unique_alias = "test_del_" + generate_short_code()
-        create_response = client.post(
-            "/api/links/shorten",
-            json={"original_url": "https://redis-cache.com", "custom_alias": unique_alias},
-            cookies={"access_token": token}
-        )
+    delete_response = client.delete(
+        f"/api/links/{unique_alias}",
+        cookies={"access_token": token}
+    )
+    assert delete_response.status_code == 200
 
-        assert create_response.status_code == 201
+    mock_redis.hset.assert_not_awaited()
+    mock_redis.set.assert_awaited_once_with(f"short:{unique_alias}", DELETED, ex=TOMBSTONE_TTL)
 
-        delete_response = client.delete(
-            f"/api/links/{unique_alias}",
-            cookies={"access_token": token}
-        )
-        assert delete_response.status_code == 200
+def test_create_link_with_redis_mock(client):
+    mock_redis = AsyncMock()
+    client.app.dependency_overrides[get_redis] = lambda: mock_redis
 
-        mock_redis.hset.assert_awaited_once()
+    response = client.post(
+        "/api/links/shorten",
+        json={"original_url": "https://example.com", "custom_alias": None}
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert "short_url" in data
 
-def test_create_link_with_redis_mock():
-    with patch("src.url.url.aioredis.from_url", new_callable=AsyncMock) as mock_from_url:
-        mock_redis = AsyncMock()
-        mock_from_url.return_value = mock_redis
+def test_redis_pool_shared_between_requests(client):
+    create_res = client.post("/api/links/shorten", json={"original_url": "https://pool.com"})
+    short_code = create_res.json()["short_url"].split("/")[-1]
+    for _ in range(5):
+        response = client.get(f"/api/links/{short_code}", follow_redirects=False)
+        assert response.status_code == 307
 
-        response = client.post(
-            "/api/links/shorten",
-            json={"original_url": "https://example.com", "custom_alias": None}
-        )
-        assert response.status_code == 201
-        data = response.json()
-        assert "short_url" in data
+    # второе соединение держит подписка на инвалидации локального кэша
+    assert len(cache.redis_pool._available_connections) + len(cache.redis_pool._in_use_connections) == 2
@@ -1,11 +1,14 @@
 import pytest
 from fastapi import HTTPException
 import datetime
+import time
 from src.auth.utils import (
     hash_password,
     verify_password,
     create_access_token,
-    decode_access_token
+    decode_access_token,
+    token_cache,
+    TokenCache
 )
 from src.config import SECRET_KEY
 
@@ -28,4 +31,33 @@ def test_expired_token():
     assert decode_access_token(expired_token) == {}
 
 def test_invalid_token_format():
-    assert decode_access_token("invalid.token.here") == {}
\ No newline at end of file
+    assert decode_access_token("invalid.token.here") == {}
+
+def test_verified_token_is_cached():
+    token = create_access_token({"sub": "cached"})
+    first = decode_access_token(token)
+    hits = token_cache.hits
+
+    first["sub"] = "changed"
+    assert decode_access_token(token)["sub"] == "cached"
+    assert token_cache.hits == hits + 1
+
+def test_token_cache_evicts_lru():
+    cache = TokenCache(max_size=2)
+    exp = time.time() + 60
+    for token in ("a", "b"):
+        cache.set(TokenCache.key(token), {"sub": token, "exp": exp})
+    cache.get(TokenCache.key("a"))
+    cache.set(TokenCache.key("c"), {"sub": "c", "exp": exp})
+
+    assert cache.get(TokenCache.key("b")) is None
+    assert cache.get(TokenCache.key("a"))["sub"] == "a"
+    assert cache.evictions == 1
+
+def test_token_cache_entry_ends_at_exp():
+    cache = TokenCache()
+    cache.set(TokenCache.key("old"), {"sub": "old", "exp": time.time() - 1})
+    assert cache.get(TokenCache.key("old")) is None
+
+def test_token_cache_key_includes_algorithm():
+    assert TokenCache.key("token", "HS256") != TokenCache.key("token", "HS512")
\ No newline at end of file
@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+import redis as sync_redis
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from src.main import app
+from src.database import get_db, get_session_factory
+from src.url import redirect
+from src.url.singleflight import SingleFlight, should_refresh_early
+from src.url.redirect import load_link, lock_key
+from src.url.redirect_cache import redirect_key
+from tests.conftest import TEST_REDIS_URL, TEST_ASYNC_DATABASE_URL
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b"https://example.com"
+
+    results = await asyncio.gather(*(flight.do("code", fetch) for _ in range(10)))
+
+    assert calls == 1
+    assert results == [b"https://example.com"] * 10
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_leader_error_is_shared():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("db down")
+
+    results = await asyncio.gather(*(flight.do("code", fail) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_follower_retries_when_leader_cancelled():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return b"value"
+
+    leader = asyncio.create_task(flight.do("code", slow))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("code", slow))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == b"value"
+
+
+def test_should_refresh_early():
+    assert not should_refresh_early(ttl_left=300, delta=0.005, beta=1.0)
+    assert not should_refresh_early(ttl_left=0, delta=0.005, beta=1.0)
+    assert not should_refresh_early(ttl_left=0.001, delta=1.0, beta=0)
+    assert any(should_refresh_early(ttl_left=0.001, delta=1.0, beta=1.0) for _ in range(100))
+
+
+@pytest.mark.asyncio
+async def test_load_link_waits_for_other_worker():
+    redis = aioredis.from_url(TEST_REDIS_URL)
+    await redis.set(lock_key("busy1"), "other-worker", px=2000)
+
+    async def other_worker():
+        await asyncio.sleep(0.05)
+        await redis.set(redirect_key("busy1"), b"https://busy.com")
+
+    # db не нужен: значение должен положить в кэш воркер, который держит блокировку
+    _, url = await asyncio.gather(other_worker(), load_link(None, redis, "busy1"))
+    assert url == b"https://busy.com"
+    await redis.aclose()
+
+
+def test_early_refresh_returns_connection_to_pool(client, monkeypatch):
+    # пул как в бою: утёкшее соединение останется выданным
+    engine = create_async_engine(TEST_ASYNC_DATABASE_URL, pool_size=2, max_overflow=0, pool_timeout=2)
+    session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def pooled_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = pooled_get_db
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    monkeypatch.setattr(redirect, "should_refresh_early", lambda *args: True)
+    r = sync_redis.Redis.from_url(TEST_REDIS_URL)
+    r.set(redirect_key("active1"), b"https://active.com", ex=60)
+    r.close()
+
+    try:
+        for _ in range(3):
+            response = client.get("/api/links/active1", follow_redirects=False)
+            assert response.status_code == 307
+            # иначе следующий запрос возьмёт ответ из L1 и до раннего обновления не дойдёт
+            redirect.redirect_cache.clear()
+        assert engine.pool.checkedout() == 0
+    finally:
+        client.portal.call(engine.dispose)
@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import event
+from src.url.tags import TagCache, tag_cache, resolve_tag, resolve_tags
+from tests.conftest import TestingAsyncSessionLocal, async_engine
+
+
+def test_tag_cache_is_bounded():
+    cache = TagCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+@pytest.mark.asyncio
+async def test_resolve_tag_upserts_case_insensitive():
+    async with TestingAsyncSessionLocal() as db:
+        created = await resolve_tag(db, "Marketing")
+        await db.commit()
+        assert await resolve_tag(db, "marketing") == created
+        assert await resolve_tag(db, "MARKETING") == created
+
+
+@pytest.mark.asyncio
+async def test_cached_tags_need_no_queries():
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    async with TestingAsyncSessionLocal() as db:
+        tag_ids = await resolve_tags(db, ["test-tag"])
+        assert tag_cache.get("test-tag") == tag_ids["test-tag"]
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+        try:
+            assert await resolve_tags(db, ["Test-Tag"]) == {"Test-Tag": tag_ids["test-tag"]}
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+
+    assert statements == []
+
+
+@pytest.mark.asyncio
+async def test_resolve_tags_uses_database_lower():
+    # lower() базы и str.lower() расходятся на не-ASCII (в локали C база их не переводит вовсе)
+    async with TestingAsyncSessionLocal() as db:
+        created = await resolve_tag(db, "İstanbul")
+        tag_ids = await resolve_tags(db, ["ÄRGER", "ärger", "Ärger"])
+        await db.commit()
+        assert set(tag_ids) == {"ÄRGER", "ärger", "Ärger"}
+        assert await resolve_tag(db, "İstanbul") == created
+        assert await resolve_tags(db, ["ÄRGER", "ärger", "Ärger"]) == tag_ids
@@ -0,0 +1,71 @@
+import pytest
+from redis import asyncio as aioredis
+from src.url.models import Link, LinkVisitors
+from src.url.clicks import record_click
+from src.url.visitors import snapshot_visitors, visitor_key, visitors_key, VISITORS_DIRTY_KEY
+from tests.conftest import TestingAsyncSessionLocal, TEST_REDIS_URL
+
+
+def snapshot(db, short_code):
+    db.expire_all()
+    link = db.query(Link).filter(Link.short_code == short_code).first()
+    return db.query(LinkVisitors).filter(LinkVisitors.link_id == link.id).first()
+
+
+def test_visitor_key_hashes_ip_and_user_agent():
+    key = visitor_key("10.0.0.1", "curl/8.0")
+    assert len(key) == 8
+    assert key == visitor_key("10.0.0.1", "curl/8.0")
+    assert key != visitor_key("10.0.0.1", "curl/8.1")
+    assert b"10.0.0.1" not in key
+
+
+@pytest.mark.asyncio
+async def test_estimate_is_close_and_bounded(db):
+    redis = aioredis.from_url(TEST_REDIS_URL)
+    for n in range(3000):
+        await record_click(redis, "uniq0", visitor_key(f"10.0.{n // 256}.{n % 256}", "test"))
+    # повторные визиты оценку не меняют
+    for n in range(100):
+        await record_click(redis, "uniq0", visitor_key(f"10.0.0.{n}", "test"))
+
+    assert abs(await redis.pfcount(visitors_key("uniq0")) - 3000) < 3000 * 0.03
+    # плотное представление HyperLogLog в Redis - 12 КБ и не растёт
+    assert await redis.strlen(visitors_key("uniq0")) <= 12304
+    await redis.aclose()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_survives_redis_loss(db):
+    db.add(Link(original_url="https://uniq1.com", short_code="uniq1"))
+    db.commit()
+
+    redis = aioredis.from_url(TEST_REDIS_URL)
+    for n in range(10):
+        await record_click(redis, "uniq1", visitor_key(f"10.0.0.{n}", "test"))
+    assert await snapshot_visitors(redis, TestingAsyncSessionLocal) == 1
+    assert snapshot(db, "uniq1").unique_visitors == 10
+    assert not await redis.exists(VISITORS_DIRTY_KEY)
+
+    # Redis потерял ключ, пришёл новый посетитель: снимок объединяется с тем, что есть
+    await redis.delete(visitors_key("uniq1"))
+    await record_click(redis, "uniq1", visitor_key("10.0.1.1", "test"))
+    assert await snapshot_visitors(redis, TestingAsyncSessionLocal) == 1
+    assert await redis.pfcount(visitors_key("uniq1")) == 11
+    await redis.aclose()
+
+    assert snapshot(db, "uniq1").unique_visitors == 11
+
+
+@pytest.mark.asyncio
+async def test_failed_snapshot_requeues_links():
+    def broken_session():
+        raise RuntimeError("база недоступна")
+
+    redis = aioredis.from_url(TEST_REDIS_URL)
+    await record_click(redis, "uniq2", visitor_key("10.0.0.1", "test"))
+
+    with pytest.raises(RuntimeError):
+        await snapshot_visitors(redis, broken_session)
+    assert await redis.smembers(VISITORS_DIRTY_KEY) == {b"uniq2"}
+    await redis.aclose()